@@ -1,10 +1,86 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+    cast,
+)
 
 import anthropic
+import httpx
+from anthropic.types import Message, TextBlock, ToolUseBlock
 
+if TYPE_CHECKING:
+    from search_tools import ToolManager, ToolOutput
+
+
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> anthropic.Anthropic:
+    """Return a shared Anthropic client per API key so keep-alive connections
+    (and their TCP+TLS handshakes) are reused across AIGenerator instances."""
+    return anthropic.Anthropic(
+        api_key=api_key,
+        max_retries=2,
+        http_client=anthropic.DefaultHttpxClient(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_async_client(api_key: str) -> anthropic.AsyncAnthropic:
+    """Return a shared async Anthropic client per API key."""
+    return anthropic.AsyncAnthropic(
+        api_key=api_key,
+        max_retries=2,
+        http_client=anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+        ),
+    )
+
+
+@dataclass(slots=True)
+class RoundState:
+    """Mutable per-query state threaded through the tool-calling rounds"""
+
+    round_number: int
+    max_rounds: int
+    messages: List[Dict[str, Any]]
+    system_content: List[Dict[str, Any]]
+    tools_available: bool
+    tool_execution_failed: bool = False
+    # Sources cited by this query's tool calls, in call order
+    sources: List[str] = field(default_factory=list)
+    source_links: List[Optional[str]] = field(default_factory=list)
 
-class AIGenerator:
-    """Handles interactions with Anthropic's Claude API for generating responses"""
+
+@dataclass(slots=True)
+class GeneratedAnswer:
+    """Final answer text plus the sources cited by the tools that produced it"""
+
+    text: str
+    sources: List[str] = field(default_factory=list)
+    source_links: List[Optional[str]] = field(default_factory=list)
+
+
+# A round yields an API message, or a user-facing error string on failure
+RoundResponse = Union[Message, str]
+
+
+class BaseAIGenerator:
+    """
+    State and helpers shared by the sync and async generators: the system
+    prompt, history handling, round bookkeeping and tool-result assembly.
+    Subclasses supply the client and the (sync or async) round loop.
+    """
 
     # Static system prompt to avoid rebuilding on each call
     SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to comprehensive search and outline tools for course information.
@@ -45,19 +121,232 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    # System prompt block tagged as an Anthropic prompt-cache breakpoint so the
+    # static prefix is reused server-side instead of re-processed every round
+    SYSTEM_BLOCK: Dict[str, Any] = {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }
+
+    # Shared system content for calls without history; never mutated
+    BASE_SYSTEM_CONTENT = [SYSTEM_BLOCK]
+
+    # Rough characters-per-token ratio used to estimate history size
+    CHARS_PER_TOKEN = 4
+
+    __slots__ = (
+        "client",
+        "model",
+        "response_cache",
+        "max_history_tokens",
+        "base_params",
+    )
+
+    def __init__(
+        self,
+        model: str,
+        response_cache=None,
+        max_history_tokens: int = 2000,
+    ):
         self.model = model
+        self.response_cache = response_cache
+        self.max_history_tokens = max_history_tokens
 
         # Pre-build base API parameters
         self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
 
+    def _build_round_state(
+        self,
+        query: str,
+        conversation_history: Optional[str],
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+    ) -> RoundState:
+        """Build the initial round state for a query."""
+
+        # Keep the cached system prompt block first; history varies per call.
+        # The prompt itself is never copied, only referenced from its block.
+        system_content = self.BASE_SYSTEM_CONTENT
+        if conversation_history:
+            history = self._truncate_history(conversation_history)
+            system_content = [
+                self.SYSTEM_BLOCK,
+                {"type": "text", "text": f"Previous conversation:\n{history}"},
+            ]
+
+        return RoundState(
+            round_number=1,
+            max_rounds=2,
+            messages=[{"role": "user", "content": query}],
+            system_content=system_content,
+            tools_available=bool(tools and tool_manager),
+        )
+
+    def _truncate_history(self, conversation_history: str) -> str:
+        """
+        Keep only the most recent history lines that fit the token budget,
+        bounding prefill cost as conversations grow.
+        """
+        budget = self.max_history_tokens * self.CHARS_PER_TOKEN
+        if len(conversation_history) <= budget:
+            return conversation_history
+
+        kept: List[str] = []
+        used = 0
+        for line in reversed(conversation_history.split("\n")):
+            used += len(line) + 1
+            if used > budget:
+                break
+            kept.append(line)
+
+        # A single over-long latest line is cut to its most recent text
+        if not kept:
+            return conversation_history[-budget:]
+        return "\n".join(reversed(kept))
+
+    def _build_api_params(
+        self, round_state: RoundState, tools: Optional[List[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Build API parameters for a single round."""
+        api_params = {
+            **self.base_params,
+            "messages": round_state.messages,
+            "system": round_state.system_content,
+        }
+
+        # Add tools if available (they can be used in any round)
+        if round_state.tools_available:
+            api_params["tools"] = tools
+            api_params["tool_choice"] = {"type": "auto"}
+
+        return api_params
+
+    def _should_terminate_early(
+        self, response: RoundResponse, round_state: RoundState
+    ) -> bool:
+        """Determine if we should terminate early (before max rounds)."""
+
+        # Condition 1: Error response
+        if isinstance(response, str):
+            return True
+
+        # Condition 2: Tool execution failed in previous round
+        if round_state.tool_execution_failed:
+            return True
+
+        # Condition 3: No tool use in response
+        content = getattr(response, "content", None)
+        if not content:
+            return True
+
+        for content_block in content:
+            if getattr(content_block, "type", None) == "tool_use":
+                return False
+        return True
+
+    @staticmethod
+    def _is_cacheable(response: RoundResponse, round_state: RoundState) -> bool:
+        """
+        Whether the final response is a complete answer worth caching: not an
+        error, not cut short by a failed tool, and made only of text blocks.
+        """
+        if isinstance(response, str) or round_state.tool_execution_failed:
+            return False
+
+        content = getattr(response, "content", None)
+        if not content:
+            return False
+
+        return all(getattr(block, "type", None) == "text" for block in content)
+
+    @staticmethod
+    def _start_tool_round(
+        response: Message, round_state: RoundState
+    ) -> List[ToolUseBlock]:
+        """Record Claude's tool-calling turn and return its tool_use blocks."""
+        round_state.messages.append({"role": "assistant", "content": response.content})
+
+        return [
+            cast(ToolUseBlock, content_block)
+            for content_block in response.content
+            if getattr(content_block, "type", None) == "tool_use"
+        ]
+
+    @staticmethod
+    def _finish_tool_round(
+        round_state: RoundState,
+        tool_blocks: List[ToolUseBlock],
+        outcomes: Sequence[Union["ToolOutput", BaseException]],
+    ) -> None:
+        """
+        Add tool results to the conversation in tool_use order and collect
+        their sources. A failed tool is reported to Claude as a result and
+        marks the loop for termination.
+        """
+        # The list becomes part of the message history sent in later rounds,
+        # so it is never reused
+        tool_results = []
+        tool_execution_failed = False
+        for block, outcome in zip(tool_blocks, outcomes):
+            if isinstance(outcome, BaseException):
+                tool_execution_failed = True
+                content = f"Tool execution failed: {str(outcome)}"
+            else:
+                content = outcome.content
+                round_state.sources.extend(outcome.sources)
+                round_state.source_links.extend(outcome.source_links)
+            tool_results.append(
+                {"type": "tool_result", "tool_use_id": block.id, "content": content}
+            )
+
+        if tool_results:
+            round_state.messages.append({"role": "user", "content": tool_results})
+
+        round_state.tool_execution_failed = tool_execution_failed
+
+    def _extract_final_text(self, response: RoundResponse) -> str:
+        """Safely extract text from final response."""
+        try:
+            # Handle error responses (strings)
+            if isinstance(response, str):
+                return response
+
+            # Handle API responses
+            if hasattr(response, "content") and response.content:
+                return cast(TextBlock, response.content[0]).text
+
+            return "I was unable to generate a complete response. Please try again."
+        except (AttributeError, IndexError, TypeError):
+            return "I encountered an error processing the response. Please try again."
+
+    def _create_error_response(self, error_message: str) -> str:
+        """Create a user-friendly error response."""
+        return f"I encountered an issue while processing your request: {error_message}. Please try rephrasing your question."
+
+
+class AIGenerator(BaseAIGenerator):
+    """Handles interactions with Anthropic's Claude API for generating responses"""
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        response_cache=None,
+        max_history_tokens: int = 2000,
+    ):
+        super().__init__(model, response_cache, max_history_tokens)
+        self.client = _get_client(api_key)
+
     def generate_response(
         self,
         query: str,
         conversation_history: Optional[str] = None,
-        tools: Optional[List] = None,
-        tool_manager=None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_manager: Optional["ToolManager"] = None,
+        cache_query: Optional[str] = None,
     ) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
@@ -68,67 +357,201 @@ Provide only the direct answer to what was asked.
             conversation_history: Previous messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            cache_query: Text the response cache is keyed on; defaults to query
 
         Returns:
             Generated response as string
         """
+        return self.generate_answer(
+            query, conversation_history, tools, tool_manager, cache_query
+        ).text
+
+    def generate_answer(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_manager: Optional["ToolManager"] = None,
+        cache_query: Optional[str] = None,
+    ) -> GeneratedAnswer:
+        """
+        Like generate_response, also returning the sources cited by this
+        query's tool calls.
+        """
+
+        # Short-circuit on a semantically equivalent prior question
+        cache_query = cache_query or query
+        query_embedding = None
+        if self.response_cache:
+            cached, query_embedding = self.response_cache.lookup(
+                cache_query, conversation_history, tools
+            )
+            if cached is not None:
+                return GeneratedAnswer(
+                    cached.response, cached.sources, cached.source_links
+                )
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
+        round_state = self._build_round_state(
+            query, conversation_history, tools, tool_manager
         )
+        response = self._run_rounds(round_state, tools, tool_manager)
+        final_text = self._extract_final_text(response)
+
+        # Only cache complete model answers, never errors or cut-short rounds
+        if self.response_cache and self._is_cacheable(response, round_state):
+            self.response_cache.store(
+                cache_query,
+                query_embedding,
+                final_text,
+                conversation_history,
+                tools,
+                round_state.sources,
+                round_state.source_links,
+            )
 
-        # Initialize round state
-        round_state = {
-            "round_number": 1,
-            "max_rounds": 2,
-            "messages": [{"role": "user", "content": query}],
-            "system_content": system_content,
-            "tools_available": bool(tools and tool_manager),
-        }
+        return GeneratedAnswer(
+            final_text, round_state.sources, round_state.source_links
+        )
+
+    def generate_response_stream(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_manager: Optional["ToolManager"] = None,
+        cache_query: Optional[str] = None,
+    ) -> Generator[str, None, GeneratedAnswer]:
+        """
+        Stream an AI response as text deltas with the same round semantics as
+        generate_response. Tool calls start executing as soon as their block
+        finishes streaming, overlapping tool I/O with the rest of the stream.
+        As with generate_response, only the final answer's text is produced.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            cache_query: Text the response cache is keyed on; defaults to query
+
+        Yields:
+            Chunks of response text
+
+        Returns:
+            The complete answer with its sources, via StopIteration
+        """
+
+        cache_query = cache_query or query
+        query_embedding = None
+        if self.response_cache:
+            cached, query_embedding = self.response_cache.lookup(
+                cache_query, conversation_history, tools
+            )
+            if cached is not None:
+                yield cached.response
+                return GeneratedAnswer(
+                    cached.response, cached.sources, cached.source_links
+                )
+
+        round_state = self._build_round_state(
+            query, conversation_history, tools, tool_manager
+        )
+
+        with ThreadPoolExecutor() as executor:
+            while round_state.round_number <= round_state.max_rounds:
+                response, pending = yield from self._stream_round(
+                    round_state, tools, tool_manager, executor
+                )
+
+                # Error responses are plain strings that were never streamed
+                if isinstance(response, str):
+                    yield response
+                    return GeneratedAnswer(response)
+
+                if self._should_terminate_early(response, round_state):
+                    break
+
+                self._prepare_next_round(response, round_state, tool_manager, pending)
+
+                # If we've reached max rounds, make one final call without tools
+                if round_state.round_number >= round_state.max_rounds:
+                    round_state.tools_available = False
+                    response, _ = yield from self._stream_round(
+                        round_state, tools, tool_manager, executor
+                    )
+                    if isinstance(response, str):
+                        yield response
+                        return GeneratedAnswer(response)
+                    break
+
+                round_state.round_number += 1
+
+        final_text = self._extract_final_text(response)
+
+        # A round that stopped on tool_use (e.g. after a failed tool) had its
+        # text held back; stream the answer the caller will record instead
+        content = getattr(response, "content", None)
+        if not content or any(
+            getattr(block, "type", None) == "tool_use" for block in content
+        ):
+            yield final_text
+
+        # Only cache complete model answers, never errors or cut-short rounds
+        if self.response_cache and self._is_cacheable(response, round_state):
+            self.response_cache.store(
+                cache_query,
+                query_embedding,
+                final_text,
+                conversation_history,
+                tools,
+                round_state.sources,
+                round_state.source_links,
+            )
+
+        return GeneratedAnswer(
+            final_text, round_state.sources, round_state.source_links
+        )
+
+    def _run_rounds(
+        self,
+        round_state: RoundState,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+    ) -> RoundResponse:
+        """Execute rounds until termination and return the final response."""
 
         # Execute rounds until termination condition
-        while round_state["round_number"] <= round_state["max_rounds"]:
+        while round_state.round_number <= round_state.max_rounds:
             response = self._execute_round(round_state, tools, tool_manager)
 
             # Check non-max-round termination conditions first
             if self._should_terminate_early(response, round_state):
-                return self._extract_final_text(response)
+                return response
 
             # If we've reached max rounds, make one final call without tools
-            if round_state["round_number"] >= round_state["max_rounds"]:
+            if round_state.round_number >= round_state.max_rounds:
                 # Prepare next round with tool results
                 self._prepare_next_round(response, round_state, tool_manager)
                 # Make final call without tools
-                round_state["tools_available"] = False
-                final_response = self._execute_round(round_state, tools, tool_manager)
-                return self._extract_final_text(final_response)
+                round_state.tools_available = False
+                return self._execute_round(round_state, tools, tool_manager)
 
             # Prepare for next round
             self._prepare_next_round(response, round_state, tool_manager)
-            round_state["round_number"] += 1
+            round_state.round_number += 1
 
         # Fallback (should not reach here)
-        return self._extract_final_text(response)
+        return response
 
     def _execute_round(
-        self, round_state: Dict[str, Any], tools: Optional[List], tool_manager
-    ) -> Any:
+        self,
+        round_state: RoundState,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+    ) -> RoundResponse:
         """Execute a single round of conversation with Claude."""
 
-        # Build API parameters for this round
-        api_params = {
-            **self.base_params,
-            "messages": round_state["messages"],
-            "system": round_state["system_content"],
-        }
-
-        # Add tools if available (they can be used in any round)
-        if round_state["tools_available"]:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+        api_params = self._build_api_params(round_state, tools)
 
         # Get response from Claude
         try:
@@ -137,143 +560,282 @@ Provide only the direct answer to what was asked.
         except Exception as e:
             # Return error response for safe handling
             return self._create_error_response(
-                f"API error in round {round_state['round_number']}: {str(e)}"
+                f"API error in round {round_state.round_number}: {str(e)}"
             )
 
-    def _should_terminate_early(self, response, round_state: Dict[str, Any]) -> bool:
-        """Determine if we should terminate early (before max rounds)."""
-
-        # Condition 1: Error response
-        if isinstance(response, str):
-            return True
-
-        # Condition 2: Tool execution failed in previous round
-        if round_state.get("tool_execution_failed", False):
-            return True
+    def _stream_round(
+        self,
+        round_state: RoundState,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+        executor: ThreadPoolExecutor,
+    ):
+        """
+        Stream a single round, yielding text deltas and submitting each tool
+        call to the executor as soon as its block completes.
 
-        # Condition 3: No tool use in response
-        if not hasattr(response, "content") or not response.content:
-            return True
+        Like generate_response, only the final answer's text is emitted: in a
+        round that may call tools, text is held back until the round ends
+        without a tool call, so preamble before a tool call is never yielded.
+        Rounds without tools stream live.
 
-        has_tool_use = any(
-            content_block.type == "tool_use"
-            for content_block in response.content
-            if hasattr(content_block, "type")
-        )
-        if not has_tool_use:
-            return True
+        Returns (via StopIteration) a tuple of the final message, or an error
+        string, and the pending tool futures keyed by tool_use id.
+        """
+        api_params = self._build_api_params(round_state, tools)
+        pending: Dict[str, Any] = {}
+        held: Optional[List[str]] = [] if round_state.tools_available else None
 
-        return False
+        try:
+            with self.client.messages.stream(**api_params) as stream:
+                for event in stream:
+                    if event.type == "text":
+                        if held is None:
+                            yield event.text
+                        else:
+                            held.append(event.text)
+                    elif (
+                        event.type == "content_block_stop"
+                        and event.content_block.type == "tool_use"
+                        and tool_manager is not None
+                    ):
+                        block = cast(ToolUseBlock, event.content_block)
+                        pending[block.id] = executor.submit(
+                            tool_manager.run_tool, block.name, **block.input
+                        )
+                message = stream.get_final_message()
+        except Exception as e:
+            return (
+                self._create_error_response(
+                    f"API error in round {round_state.round_number}: {str(e)}"
+                ),
+                pending,
+            )
 
-    def _prepare_next_round(self, response, round_state: Dict[str, Any], tool_manager):
-        """Prepare state for next round after tool execution."""
+        if held and not any(
+            getattr(block, "type", None) == "tool_use" for block in message.content
+        ):
+            yield from held
+        return message, pending
 
-        # Add Claude's response with tools to messages
-        round_state["messages"].append(
-            {"role": "assistant", "content": response.content}
-        )
+    def _prepare_next_round(
+        self,
+        response: Message,
+        round_state: RoundState,
+        tool_manager: "ToolManager",
+        pending: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Prepare state for next round after tool execution.
 
-        # Execute tools and collect results
-        tool_results = []
-        tool_execution_failed = False
+        Tool calls already started while streaming are passed in ``pending``
+        as futures keyed by tool_use id and awaited instead of re-executed.
+        Remaining tool calls run in parallel when there is more than one.
+        """
+        tool_blocks = self._start_tool_round(response, round_state)
+
+        # Nothing to run: skip building futures and result containers
+        if not tool_blocks:
+            round_state.tool_execution_failed = False
+            return
+
+        # Independent tool calls run concurrently; wall time is max, not sum
+        pending = pending or {}
+        unstarted = [block for block in tool_blocks if block.id not in pending]
+        executor = None
+        if len(unstarted) > 1:
+            # Copy only when adding futures; the caller's dict is left untouched
+            pending = dict(pending)
+            executor = ThreadPoolExecutor(max_workers=len(unstarted))
+            for block in unstarted:
+                pending[block.id] = executor.submit(
+                    tool_manager.run_tool, block.name, **block.input
+                )
 
-        for content_block in response.content:
-            if hasattr(content_block, "type") and content_block.type == "tool_use":
+        # Collect outcomes in tool_use order
+        outcomes: List[Union["ToolOutput", Exception]] = []
+        try:
+            for content_block in tool_blocks:
                 try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, **content_block.input
-                    )
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
+                    if content_block.id in pending:
+                        outcomes.append(pending[content_block.id].result())
+                    else:
+                        outcomes.append(
+                            tool_manager.run_tool(
+                                content_block.name, **content_block.input
+                            )
+                        )
                 except Exception as e:
-                    # Tool execution failed - mark for termination
-                    tool_execution_failed = True
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": f"Tool execution failed: {str(e)}",
-                        }
-                    )
+                    outcomes.append(e)
+        finally:
+            if executor:
+                executor.shutdown()
 
-        # Add tool results to conversation
-        if tool_results:
-            round_state["messages"].append({"role": "user", "content": tool_results})
+        self._finish_tool_round(round_state, tool_blocks, outcomes)
 
-        # Mark if tool execution failed
-        round_state["tool_execution_failed"] = tool_execution_failed
 
-    def _extract_final_text(self, response) -> str:
-        """Safely extract text from final response."""
-        try:
-            # Handle error responses (strings)
-            if isinstance(response, str):
-                return response
+class AsyncAIGenerator(BaseAIGenerator):
+    """
+    Async counterpart of AIGenerator built on AsyncAnthropic.
 
-            # Handle API responses
-            if hasattr(response, "content") and response.content:
-                return response.content[0].text
+    Rounds await the API instead of blocking a worker thread, and the tool
+    calls of a round run concurrently via ToolManager.arun_tool.
+    """
 
-            return "I was unable to generate a complete response. Please try again."
-        except (AttributeError, IndexError, TypeError):
-            return "I encountered an error processing the response. Please try again."
+    __slots__ = ()
 
-    def _create_error_response(self, error_message: str) -> str:
-        """Create a user-friendly error response."""
-        return f"I encountered an issue while processing your request: {error_message}. Please try rephrasing your question."
-
-    def _handle_tool_execution(
-        self, initial_response, base_params: Dict[str, Any], tool_manager
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        response_cache=None,
+        max_history_tokens: int = 2000,
     ):
+        super().__init__(model, response_cache, max_history_tokens)
+        self.client = _get_async_client(api_key)
+
+    async def generate_response(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_manager: Optional["ToolManager"] = None,
+        cache_query: Optional[str] = None,
+    ) -> str:
         """
-        Handle execution of tool calls and get follow-up response.
+        Generate AI response with optional tool usage and conversation context.
+        Same round semantics as AIGenerator.generate_response.
 
         Args:
-            initial_response: The response containing tool use requests
-            base_params: Base API parameters
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            cache_query: Text the response cache is keyed on; defaults to query
 
         Returns:
-            Final response text after tool execution
+            Generated response as string
         """
-        # Start with existing messages
-        messages = base_params["messages"].copy()
+        answer = await self.generate_answer(
+            query, conversation_history, tools, tool_manager, cache_query
+        )
+        return answer.text
 
-        # Add AI's tool use response
-        messages.append({"role": "assistant", "content": initial_response.content})
+    async def generate_answer(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_manager: Optional["ToolManager"] = None,
+        cache_query: Optional[str] = None,
+    ) -> GeneratedAnswer:
+        """
+        Like generate_response, also returning the sources cited by this
+        query's tool calls.
+        """
 
-        # Execute all tool calls and collect results
-        tool_results = []
-        for content_block in initial_response.content:
-            if content_block.type == "tool_use":
-                tool_result = tool_manager.execute_tool(
-                    content_block.name, **content_block.input
+        # The cache embeds the query on CPU; keep that off the event loop
+        cache_query = cache_query or query
+        query_embedding = None
+        if self.response_cache:
+            cached, query_embedding = await asyncio.to_thread(
+                self.response_cache.lookup,
+                cache_query,
+                conversation_history,
+                tools,
+            )
+            if cached is not None:
+                return GeneratedAnswer(
+                    cached.response, cached.sources, cached.source_links
                 )
 
-                tool_results.append(
-                    {
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": tool_result,
-                    }
-                )
+        round_state = self._build_round_state(
+            query, conversation_history, tools, tool_manager
+        )
+        response = await self._run_rounds(round_state, tools, tool_manager)
+        final_text = self._extract_final_text(response)
+
+        # Only cache complete model answers, never errors or cut-short rounds
+        if self.response_cache and self._is_cacheable(response, round_state):
+            await asyncio.to_thread(
+                self.response_cache.store,
+                cache_query,
+                query_embedding,
+                final_text,
+                conversation_history,
+                tools,
+                round_state.sources,
+                round_state.source_links,
+            )
 
-        # Add tool results as single message
-        if tool_results:
-            messages.append({"role": "user", "content": tool_results})
+        return GeneratedAnswer(
+            final_text, round_state.sources, round_state.source_links
+        )
 
-        # Prepare final API call without tools
-        final_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": base_params["system"],
-        }
+    async def _run_rounds(
+        self,
+        round_state: RoundState,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+    ) -> RoundResponse:
+        """Execute rounds until termination and return the final response."""
+
+        while round_state.round_number <= round_state.max_rounds:
+            response = await self._execute_round(round_state, tools, tool_manager)
+
+            if self._should_terminate_early(response, round_state):
+                return response
+
+            # If we've reached max rounds, make one final call without tools
+            if round_state.round_number >= round_state.max_rounds:
+                await self._prepare_next_round(response, round_state, tool_manager)
+                round_state.tools_available = False
+                return await self._execute_round(round_state, tools, tool_manager)
+
+            await self._prepare_next_round(response, round_state, tool_manager)
+            round_state.round_number += 1
+
+        # Fallback (should not reach here)
+        return response
+
+    async def _execute_round(
+        self,
+        round_state: RoundState,
+        tools: Optional[List[Dict[str, Any]]],
+        tool_manager: Optional["ToolManager"],
+    ) -> RoundResponse:
+        """Execute a single round of conversation with Claude."""
+
+        api_params = self._build_api_params(round_state, tools)
+
+        try:
+            return await self.client.messages.create(**api_params)
+        except Exception as e:
+            return self._create_error_response(
+                f"API error in round {round_state.round_number}: {str(e)}"
+            )
+
+    async def _prepare_next_round(
+        self, response: Message, round_state: RoundState, tool_manager: "ToolManager"
+    ) -> None:
+        """Prepare state for next round, executing all tool calls concurrently."""
+        tool_blocks = self._start_tool_round(response, round_state)
+
+        # gather preserves order, so results line up with their tool_use ids
+        outcomes = await asyncio.gather(
+            *[
+                tool_manager.arun_tool(block.name, **block.input)
+                for block in tool_blocks
+            ],
+            return_exceptions=True,
+        )
+
+        # Cancellation and other non-Exception signals must propagate, not be
+        # reported to Claude as a failed tool
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException) and not isinstance(
+                outcome, Exception
+            ):
+                raise outcome
 
-        # Get final response
-        final_response = self.client.messages.create(**final_params)
-        return final_response.content[0].text
+        self._finish_tool_round(round_state, tool_blocks, outcomes)
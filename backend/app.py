@@ -1,3 +1,4 @@
+import json
 import os
 import warnings
 from pathlib import Path
@@ -7,28 +8,25 @@ from config import config
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from rag_system import RAGSystem
 
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
-# Initialize FastAPI app
-app = FastAPI(title="Course Materials RAG System", root_path="")
+# Initialize FastAPI app; JSON bodies are encoded with orjson
+app = FastAPI(
+    title="Course Materials RAG System",
+    root_path="",
+    default_response_class=ORJSONResponse,
+)
 
 # Add trusted host middleware for proxy
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
 # Enable CORS with proper settings for proxy
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-)
+app.add_middleware(CORSMiddleware, **config.CORS_SETTINGS)
 
 # Initialize RAG system
 rag_system = RAGSystem(config)
@@ -38,6 +36,9 @@ rag_system = RAGSystem(config)
 class QueryRequest(BaseModel):
     """Request model for course queries"""
 
+    # Unknown fields are dropped during validation rather than kept as extras
+    model_config = ConfigDict(extra="ignore")
+
     query: str
     session_id: Optional[str] = None
 
@@ -61,6 +62,8 @@ class CourseStats(BaseModel):
 class ClearSessionRequest(BaseModel):
     """Request model for clearing a session"""
 
+    model_config = ConfigDict(extra="ignore")
+
     session_id: str
 
 
@@ -76,27 +79,54 @@ async def query_documents(request: QueryRequest):
         if not session_id:
             session_id = rag_system.session_manager.create_session()
 
-        # Process query using RAG system
-        answer, sources, source_links = rag_system.query(request.query, session_id)
+        # Process query using RAG system without blocking the event loop
+        answer, sources, source_links = await rag_system.aquery(
+            request.query, session_id
+        )
 
-        return QueryResponse(
-            answer=answer,
-            sources=sources,
-            source_links=source_links,
-            session_id=session_id,
+        # Returned as-is; response_model only documents the schema
+        return ORJSONResponse(
+            {
+                "answer": answer,
+                "sources": sources,
+                "source_links": source_links,
+                "session_id": session_id,
+            }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the response as newline-delimited JSON events"""
+
+    def event_stream():
+        try:
+            # Session creation can fail too; report it as an error event
+            session_id = request.session_id
+            if not session_id:
+                session_id = rag_system.session_manager.create_session()
+
+            yield json.dumps({"type": "session", "session_id": session_id}) + "\n"
+            for event in rag_system.query_stream(request.query, session_id):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 @app.get("/api/courses", response_model=CourseStats)
 async def get_course_stats():
     """Get course analytics and statistics"""
     try:
         analytics = rag_system.get_course_analytics()
-        return CourseStats(
-            total_courses=analytics["total_courses"],
-            course_titles=analytics["course_titles"],
+        return ORJSONResponse(
+            {
+                "total_courses": analytics["total_courses"],
+                "course_titles": analytics["course_titles"],
+            }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
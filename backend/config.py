@@ -1,5 +1,6 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any, Dict
 
 from dotenv import load_dotenv
 
@@ -23,9 +24,27 @@ class Config:
     CHUNK_OVERLAP: int = 100  # Characters to overlap between chunks
     MAX_RESULTS: int = 5  # Maximum search results to return
     MAX_HISTORY: int = 2  # Number of conversation messages to remember
+    MAX_HISTORY_TOKENS: int = 2000  # Token budget for history sent to Claude
+
+    # Semantic response cache settings
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 3600  # Seconds before a cached response expires
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000  # Oldest entries evicted beyond this
+    RESPONSE_CACHE_DISTANCE: float = 0.1  # Max cosine distance for a cache hit
 
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
 
+    # CORS middleware settings, open so the app works behind any proxy
+    CORS_SETTINGS: Dict[str, Any] = field(
+        default_factory=lambda: {
+            "allow_origins": ["*"],
+            "allow_credentials": True,
+            "allow_methods": ["*"],
+            "allow_headers": ["*"],
+            "expose_headers": ["*"],
+        }
+    )
+
 
 config = Config()
@@ -1,9 +1,10 @@
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Generator, Iterator, List, Optional, Tuple
 
-from ai_generator import AIGenerator
+from ai_generator import AIGenerator, AsyncAIGenerator, GeneratedAnswer
 from document_processor import DocumentProcessor
 from models import Course, CourseChunk, Lesson
+from response_cache import ResponseCache
 from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
 from session_manager import SessionManager
 from vector_store import VectorStore
@@ -22,8 +23,25 @@ class RAGSystem:
         self.vector_store = VectorStore(
             config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
         )
+        self.response_cache = None
+        if config.RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                self.vector_store.embedding_function,
+                ttl_seconds=config.RESPONSE_CACHE_TTL,
+                max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+                distance_threshold=config.RESPONSE_CACHE_DISTANCE,
+            )
         self.ai_generator = AIGenerator(
-            config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            response_cache=self.response_cache,
+            max_history_tokens=config.MAX_HISTORY_TOKENS,
+        )
+        self.async_ai_generator = AsyncAIGenerator(
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            response_cache=self.response_cache,
+            max_history_tokens=config.MAX_HISTORY_TOKENS,
         )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
@@ -56,6 +74,9 @@ class RAGSystem:
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
 
+            # Cached answers may predate the new course
+            self._invalidate_caches()
+
             return course, len(course_chunks)
         except Exception as e:
             print(f"Error processing course document {file_path}: {e}")
@@ -81,6 +102,7 @@ class RAGSystem:
         if clear_existing:
             print("Clearing existing data for fresh rebuild...")
             self.vector_store.clear_all_data()
+            self._invalidate_caches()
 
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
@@ -117,8 +139,17 @@ class RAGSystem:
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
 
+        # Cached answers may predate the newly added courses
+        if total_courses:
+            self._invalidate_caches()
+
         return total_courses, total_chunks
 
+    def _invalidate_caches(self):
+        """Drop cached results that depend on the course catalog"""
+        if self.response_cache:
+            self.response_cache.clear()
+
     def query(
         self, query: str, session_id: Optional[str] = None
     ) -> Tuple[str, List[str], List[Optional[str]]]:
@@ -140,27 +171,105 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
+        # Generate response using AI with tools; sources come back with the
+        # answer, so concurrent queries never share them
+        answer = self.ai_generator.generate_answer(
             query=prompt,
             conversation_history=history,
             tools=self.tool_manager.get_tool_definitions(),
             tool_manager=self.tool_manager,
+            cache_query=query,
         )
 
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
-        source_links = self.tool_manager.get_last_source_links()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
-
         # Update conversation history
         if session_id:
-            self.session_manager.add_exchange(session_id, query, response)
+            self.session_manager.add_exchange(session_id, query, answer.text)
 
         # Return response with sources and links from tool searches
-        return response, sources, source_links
+        return answer.text, answer.sources, answer.source_links
+
+    async def aquery(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Tuple[str, List[str], List[Optional[str]]]:
+        """
+        Process a user query like query(), awaiting the AI instead of blocking.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Returns:
+            Tuple of (response, sources list, source links list)
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        answer = await self.async_ai_generator.generate_answer(
+            query=prompt,
+            conversation_history=history,
+            tools=self.tool_manager.get_tool_definitions(),
+            tool_manager=self.tool_manager,
+            cache_query=query,
+        )
+
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, answer.text)
+
+        return answer.text, answer.sources, answer.source_links
+
+    def query_stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Process a user query like query(), streaming the response as it is generated.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "text", "text": ...} events for each response chunk, then a
+            final {"type": "sources", "sources": ..., "source_links": ...} event
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        stream = self.ai_generator.generate_response_stream(
+            query=prompt,
+            conversation_history=history,
+            tools=self.tool_manager.get_tool_definitions(),
+            tool_manager=self.tool_manager,
+            cache_query=query,
+        )
+        # The stream returns the complete answer, with its sources, when done
+        answer = yield from self._text_events(stream)
+
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, answer.text)
+
+        yield {
+            "type": "sources",
+            "sources": answer.sources,
+            "source_links": answer.source_links,
+        }
+
+    @staticmethod
+    def _text_events(
+        stream: Generator[str, None, GeneratedAnswer],
+    ) -> Generator[Dict[str, Any], None, GeneratedAnswer]:
+        """Wrap each streamed chunk in a text event, passing the answer through"""
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as stop:
+                return stop.value
+            yield {"type": "text", "text": chunk}
 
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
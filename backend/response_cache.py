@@ -0,0 +1,209 @@
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+import chromadb
+from chromadb.config import Settings
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """A cached answer with the sources it cited"""
+
+    response: str
+    sources: List[str] = field(default_factory=list)
+    source_links: List[Optional[str]] = field(default_factory=list)
+
+
+# Numbers in a question (lesson numbers, versions) that must match exactly
+_NUMBER_PATTERN = re.compile(r"\d+")
+
+
+class ResponseCache:
+    """Semantic cache of final AI responses keyed on query similarity and context"""
+
+    def __init__(
+        self,
+        embedding_function,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        distance_threshold: float = 0.1,
+    ):
+        self.embedding_function = embedding_function
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.distance_threshold = distance_threshold
+
+        # Cached answers only live as long as the process, so keep them in memory.
+        # The in-memory client is shared process-wide, hence the unique name.
+        client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+        # Embeddings are always supplied explicitly; cosine space makes the
+        # threshold read as (1 - cosine similarity)
+        self.collection = client.create_collection(
+            name=f"response_cache_{uuid.uuid4().hex}",
+            embedding_function=None,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+        # In-process index of entry id -> insertion time, oldest first
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        # Lookups and stores run on worker threads; the lock keeps the index
+        # and the collection's entries in step
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def history_hash(conversation_history: Optional[str]) -> str:
+        """Hash the conversation history so multi-turn context is part of the key"""
+        return hashlib.sha256((conversation_history or "").encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def tool_hash(tools: Optional[List]) -> str:
+        """Fingerprint the tool set offered to the model"""
+        payload = json.dumps(tools or [], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def number_key(query: str) -> str:
+        """
+        The numbers in a query, in order. Questions differing only in a lesson
+        number embed almost identically, so these must match exactly.
+        """
+        return " ".join(_NUMBER_PATTERN.findall(query))
+
+    def embed(self, query: str) -> List[float]:
+        """Embed a query with the shared sentence-transformer model"""
+        return [float(x) for x in self.embedding_function([query])[0]]
+
+    def lookup(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+    ) -> Tuple[Optional[CachedResponse], List[float]]:
+        """
+        Find a cached response for a semantically similar question in the same
+        context. Callers pass the user's raw question, not the templated prompt,
+        so the template does not dominate the similarity.
+
+        Returns:
+            Tuple of (cached response or None, query embedding for a later store)
+        """
+        query_embedding = self.embed(query)
+        with self._lock:
+            self._evict_expired()
+            if not self._entries:
+                return None, query_embedding
+
+        try:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=1,
+                where={
+                    "$and": [
+                        {"history_hash": self.history_hash(conversation_history)},
+                        {"tool_hash": self.tool_hash(tools)},
+                        {"numbers": self.number_key(query)},
+                    ]
+                },
+            )
+        except Exception as e:
+            print(f"Error querying response cache: {e}")
+            return None, query_embedding
+
+        # Distances, documents and metadatas are optional in a query result
+        distances = results["distances"]
+        documents = results["documents"]
+        metadatas = results["metadatas"]
+        if (
+            results["ids"]
+            and results["ids"][0]
+            and distances
+            and documents
+            and metadatas
+        ):
+            if distances[0][0] <= self.distance_threshold:
+                metadata = metadatas[0][0]
+                return (
+                    CachedResponse(
+                        documents[0][0],
+                        json.loads(str(metadata.get("sources", "[]"))),
+                        json.loads(str(metadata.get("source_links", "[]"))),
+                    ),
+                    query_embedding,
+                )
+
+        return None, query_embedding
+
+    def store(
+        self,
+        query: str,
+        query_embedding: List[float],
+        response: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        sources: Sequence[str] = (),
+        source_links: Sequence[Optional[str]] = (),
+    ):
+        """
+        Add a final response and the sources it cited to the cache, evicting
+        the oldest entries if full.
+        """
+        # Metadata values must be scalars, so the source lists are stored as JSON
+        metadata = {
+            "history_hash": self.history_hash(conversation_history),
+            "tool_hash": self.tool_hash(tools),
+            "numbers": self.number_key(query),
+            "sources": json.dumps(list(sources)),
+            "source_links": json.dumps(list(source_links)),
+        }
+        with self._lock:
+            self._evict_expired()
+            overflow = len(self._entries) - self.max_entries + 1
+            if overflow > 0:
+                self._delete(list(itertools.islice(self._entries, overflow)))
+
+            entry_id = uuid.uuid4().hex
+            timestamp = time.time()
+            try:
+                self.collection.add(
+                    ids=[entry_id],
+                    embeddings=[query_embedding],
+                    documents=[response],
+                    metadatas=[{**metadata, "ts": timestamp}],
+                )
+                self._entries[entry_id] = timestamp
+            except Exception as e:
+                print(f"Error storing response in cache: {e}")
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._delete(list(self._entries))
+
+    def _evict_expired(self):
+        """Drop entries older than the TTL; the caller holds the lock"""
+        cutoff = time.time() - self.ttl_seconds
+        expired = []
+        for entry_id, timestamp in self._entries.items():
+            if timestamp > cutoff:
+                break
+            expired.append(entry_id)
+        self._delete(expired)
+
+    def _delete(self, entry_ids: List[Any]):
+        """Delete entries from the collection and the index; caller holds the lock"""
+        if not entry_ids:
+            return
+        for entry_id in entry_ids:
+            self._entries.pop(entry_id, None)
+        try:
+            self.collection.delete(ids=entry_ids)
+        except Exception as e:
+            print(f"Error evicting response cache entries: {e}")
@@ -1,12 +1,50 @@
+import asyncio
+import functools
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Protocol
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from vector_store import SearchResults, VectorStore, format_course_outline
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_lessons(lessons_json: str) -> Tuple[Tuple[Any, str], ...]:
+    """
+    Parse a course's lessons JSON into (number, title) pairs sorted by lesson
+    number. The pairs are immutable, so cached results are safe to share.
+    """
+    try:
+        lessons = orjson.loads(lessons_json)
+    except orjson.JSONDecodeError:
+        return ()
+    # Lessons stored without a number sort last, after every numbered lesson
+    return tuple(
+        (
+            lesson.get("lesson_number", "Unknown"),
+            lesson.get("lesson_title", "Untitled"),
+        )
+        for lesson in sorted(
+            lessons, key=lambda lesson: lesson.get("lesson_number", 10**9)
+        )
+    )
+
+
+@dataclass(slots=True)
+class ToolOutput:
+    """Result of a single tool call: text for Claude plus the sources it cites"""
 
-from vector_store import SearchResults, VectorStore
+    content: str
+    sources: List[str] = field(default_factory=list)
+    source_links: List[Optional[str]] = field(default_factory=list)
 
 
 class Tool(ABC):
     """Abstract base class for all tools"""
 
+    # Empty slots so subclasses can drop the per-instance __dict__
+    __slots__ = ()
+
     @abstractmethod
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
@@ -17,39 +55,56 @@ class Tool(ABC):
         """Execute the tool with given parameters"""
         pass
 
+    def run(self, **kwargs) -> ToolOutput:
+        """
+        Execute the tool and return its output with any sources it cites.
+
+        Sources travel with each call's result rather than living on the tool,
+        so concurrent queries sharing a tool never see each other's sources.
+        Tools that cite sources override this; the rest cite none.
+        """
+        return ToolOutput(self.execute(**kwargs))
+
+    async def arun(self, **kwargs) -> ToolOutput:
+        """Run the tool without blocking the event loop"""
+        return await asyncio.to_thread(self.run, **kwargs)
+
 
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
 
+    __slots__ = ("store",)
+
+    # Static schema shared by every instance; callers must not mutate it
+    TOOL_DEFINITION: Dict[str, Any] = {
+        "name": "search_course_content",
+        "description": "Search course materials with smart course name matching and lesson filtering",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "What to search for in the course content",
+                },
+                "course_name": {
+                    "type": "string",
+                    "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
+                },
+                "lesson_number": {
+                    "type": "integer",
+                    "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
+                },
+            },
+            "required": ["query"],
+        },
+    }
+
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
-        self.last_source_links = []  # Track source links from last search
 
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "search_course_content",
-            "description": "Search course materials with smart course name matching and lesson filtering",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "What to search for in the course content",
-                    },
-                    "course_name": {
-                        "type": "string",
-                        "description": "Course title (partial matches work, e.g. 'MCP', 'Introduction')",
-                    },
-                    "lesson_number": {
-                        "type": "integer",
-                        "description": "Specific lesson number to search within (e.g. 1, 2, 3)",
-                    },
-                },
-                "required": ["query"],
-            },
-        }
+        return self.TOOL_DEFINITION
 
     def execute(
         self,
@@ -68,6 +123,27 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
+        return self.run(
+            query=query, course_name=course_name, lesson_number=lesson_number
+        ).content
+
+    def run(
+        self,
+        query: str,
+        course_name: Optional[str] = None,
+        lesson_number: Optional[int] = None,
+    ) -> ToolOutput:
+        """
+        Search like execute(), also returning the sources of the results.
+
+        Args:
+            query: What to search for
+            course_name: Optional course filter
+            lesson_number: Optional lesson filter
+
+        Returns:
+            Formatted results with their sources and links, or an error message
+        """
 
         # Use the vector store's unified search interface
         results = self.store.search(
@@ -76,7 +152,7 @@ class CourseSearchTool(Tool):
 
         # Handle errors
         if results.error:
-            return results.error
+            return ToolOutput(results.error)
 
         # Handle empty results
         if results.is_empty():
@@ -85,73 +161,65 @@ class CourseSearchTool(Tool):
                 filter_info += f" in course '{course_name}'"
             if lesson_number:
                 filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
+            return ToolOutput(f"No relevant content found{filter_info}.")
 
         # Format and return results
         return self._format_results(results)
 
-    def _format_results(self, results: SearchResults) -> str:
+    def _format_results(self, results: SearchResults) -> ToolOutput:
         """Format search results with course and lesson context"""
-        formatted = []
-        sources = []  # Track sources for the UI
-        source_links = []  # Track links for the UI
+        count = len(results.documents)
+        formatted = [""] * count
+        sources = [""] * count  # Track sources for the UI
+        pairs = [("", None)] * count  # (course title, lesson number) per result
 
-        for doc, meta in zip(results.documents, results.metadata):
+        for i, (doc, meta) in enumerate(zip(results.documents, results.metadata)):
             course_title = meta.get("course_title", "unknown")
             lesson_num = meta.get("lesson_number")
 
-            # Build context header
-            header = f"[{course_title}"
-            if lesson_num is not None:
-                header += f" - Lesson {lesson_num}"
-            header += "]"
-
-            # Track source for the UI
-            source = course_title
-            if lesson_num is not None:
-                source += f" - Lesson {lesson_num}"
-            sources.append(source)
-
-            # Get the lesson link if available
-            link = None
-            if lesson_num is not None:
-                link = self.store.get_lesson_link(course_title, lesson_num)
-            elif course_title != "unknown":
-                # If no lesson number, try to get course link
-                link = self.store.get_course_link(course_title)
-            source_links.append(link)
+            # Source label doubles as the context header
+            source = (
+                f"{course_title} - Lesson {lesson_num}"
+                if lesson_num is not None
+                else course_title
+            )
+            sources[i] = source
+            pairs[i] = (course_title, lesson_num)
+            formatted[i] = f"[{source}]\n{doc}"
 
-            formatted.append(f"{header}\n{doc}")
+        # Fetch every lesson/course link in a single catalog round-trip
+        source_links = self.store.get_links_batch(pairs)
 
-        # Store sources and links for retrieval
-        self.last_sources = sources
-        self.last_source_links = source_links
-
-        return "\n\n".join(formatted)
+        return ToolOutput("\n\n".join(formatted), sources, source_links)
 
 
 class CourseOutlineTool(Tool):
     """Tool for getting course outlines with lesson lists"""
 
+    __slots__ = ("store",)
+
+    # Static schema shared by every instance; callers must not mutate it
+    TOOL_DEFINITION: Dict[str, Any] = {
+        "name": "get_course_outline",
+        "description": "Get a course outline including title, course link, and complete lesson list",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "course_title": {
+                    "type": "string",
+                    "description": "Course title to get outline for (partial matches work, e.g. 'MCP', 'Introduction')",
+                }
+            },
+            "required": ["course_title"],
+        },
+    }
+
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
 
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
-        return {
-            "name": "get_course_outline",
-            "description": "Get a course outline including title, course link, and complete lesson list",
-            "input_schema": {
-                "type": "object",
-                "properties": {
-                    "course_title": {
-                        "type": "string",
-                        "description": "Course title to get outline for (partial matches work, e.g. 'MCP', 'Introduction')",
-                    }
-                },
-                "required": ["course_title"],
-            },
-        }
+        return self.TOOL_DEFINITION
 
     def execute(self, course_title: str) -> str:
         """
@@ -163,13 +231,16 @@ class CourseOutlineTool(Tool):
         Returns:
             Formatted course outline or error message
         """
-        import json
-
         # Resolve course name using vector search
         resolved_title = self.store._resolve_course_name(course_title)
         if not resolved_title:
             return f"No course found matching '{course_title}'"
 
+        # Repeat requests for a course skip the catalog entirely
+        cached_outline = self.store.outline_cache.get(resolved_title)
+        if cached_outline is not None:
+            return cached_outline
+
         # Get course metadata from catalog
         try:
             results = self.store.course_catalog.get(ids=[resolved_title])
@@ -178,57 +249,74 @@ class CourseOutlineTool(Tool):
 
             metadata = results["metadatas"][0]
 
-            # Extract course information
-            title = metadata.get("title", "Unknown Course")
-            course_link = metadata.get("course_link")
-            lessons_json = metadata.get("lessons_json", "[]")
-
-            # Parse lessons
-            try:
-                lessons = json.loads(lessons_json)
-            except json.JSONDecodeError:
-                lessons = []
-
-            # Format the outline
-            outline_parts = [f"**{title}**"]
-
-            if course_link:
-                outline_parts.append(f"Course Link: {course_link}")
-            else:
-                outline_parts.append("Course Link: Not available")
-
-            if lessons:
-                outline_parts.append("\n**Lessons:**")
-                for lesson in sorted(lessons, key=lambda x: x.get("lesson_number", 0)):
-                    lesson_num = lesson.get("lesson_number", "Unknown")
-                    lesson_title = lesson.get("lesson_title", "Untitled")
-                    outline_parts.append(f"{lesson_num}. {lesson_title}")
-            else:
-                outline_parts.append("\nNo lessons found for this course.")
-
-            return "\n".join(outline_parts)
+            # Outlines rendered at ingestion are served as-is
+            outline = metadata.get("formatted_outline")
+            if not outline:
+                # Parse lessons (memoized, already sorted by lesson number)
+                lessons = _parse_lessons(metadata.get("lessons_json", "[]"))
+                outline = format_course_outline(
+                    metadata.get("title", "Unknown Course"),
+                    metadata.get("course_link"),
+                    lessons,
+                )
 
         except Exception as e:
             return f"Error retrieving course outline: {str(e)}"
 
+        self.store.outline_cache.put(resolved_title, outline)
+        return outline
+
 
 class ToolManager:
     """Manages available tools for the AI"""
 
+    __slots__ = ("tools", "_tool_definitions", "_definitions_cache")
+
     def __init__(self):
         self.tools = {}
+        # Tool schemas are static, so definitions are built once per registration
+        self._tool_definitions: Dict[str, Dict[str, Any]] = {}
+        self._definitions_cache: list = []
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
+        self._add_tool(tool)
+        self._rebuild_definitions_cache()
+
+    def register_tools(self, tools: Iterable[Tool]):
+        """Register several tools, rebuilding the cached definitions once"""
+        for tool in tools:
+            self._add_tool(tool)
+        self._rebuild_definitions_cache()
+
+    def _add_tool(self, tool: Tool):
+        """Record a tool and its definition without refreshing the cache"""
         tool_def = tool.get_tool_definition()
         tool_name = tool_def.get("name")
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._tool_definitions[tool_name] = tool_def
+
+    def _rebuild_definitions_cache(self):
+        """Rebuild the cached definition list after a registration"""
+        definitions = list(self._tool_definitions.values())
+
+        # A breakpoint on the last tool caches every tool schema as one prefix
+        if definitions:
+            definitions[-1] = {
+                **definitions[-1],
+                "cache_control": {"type": "ephemeral"},
+            }
+        self._definitions_cache = definitions
 
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """
+        Get all tool definitions for Anthropic tool calling.
+
+        Returns the shared cached list; callers must not mutate it.
+        """
+        return self._definitions_cache
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
@@ -237,26 +325,16 @@ class ToolManager:
 
         return self.tools[tool_name].execute(**kwargs)
 
-    def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources") and tool.last_sources:
-                return tool.last_sources
-        return []
-
-    def get_last_source_links(self) -> list:
-        """Get source links from the last search operation"""
-        # Check all tools for last_source_links attribute
-        for tool in self.tools.values():
-            if hasattr(tool, "last_source_links") and tool.last_source_links:
-                return tool.last_source_links
-        return []
-
-    def reset_sources(self):
-        """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources"):
-                tool.last_sources = []
-            if hasattr(tool, "last_source_links"):
-                tool.last_source_links = []
+    def run_tool(self, tool_name: str, **kwargs) -> ToolOutput:
+        """Run a tool by name, returning its output and cited sources"""
+        if tool_name not in self.tools:
+            return ToolOutput(f"Tool '{tool_name}' not found")
+
+        return self.tools[tool_name].run(**kwargs)
+
+    async def arun_tool(self, tool_name: str, **kwargs) -> ToolOutput:
+        """Run a tool by name without blocking the event loop"""
+        if tool_name not in self.tools:
+            return ToolOutput(f"Tool '{tool_name}' not found")
+
+        return await self.tools[tool_name].arun(**kwargs)
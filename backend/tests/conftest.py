@@ -1,57 +1,216 @@
+import asyncio
+import functools
+import json
 import os
-import shutil
 import sys
-import tempfile
-from unittest.mock import MagicMock, Mock, patch
+from types import SimpleNamespace
+from typing import List, Optional
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
-from fastapi.testclient import TestClient
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+from pydantic import BaseModel, ConfigDict
 
 # Add the backend directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import after path setup to avoid import errors
-from ai_generator import AIGenerator  # noqa: E402
+# Import after path setup to avoid import errors. Modules that pull in chromadb,
+# sentence-transformers or anthropic are imported inside the fixtures using them.
 from config import Config  # noqa: E402
-from rag_system import RAGSystem  # noqa: E402
-from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager  # noqa: E402
-from vector_store import VectorStore  # noqa: E402
+from tests.rag_defaults import (  # noqa: E402
+    DEFAULT_ANSWER,
+    DEFAULT_LINKS,
+    DEFAULT_SOURCES,
+)
 
 
-@pytest.fixture
-def test_config():
-    """Test configuration with minimal settings"""
+@functools.lru_cache(maxsize=None)
+def _vector_store_spec():
+    """
+    Attribute names of VectorStore, computed once.
+
+    Spec'ing against the class re-inspects every attribute for coroutines on
+    each Mock; VectorStore is fully synchronous, so its names are enough.
+    """
+    from vector_store import VectorStore
+
+    return dir(VectorStore)
+
+
+# Request/Response models
+class QueryRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    query: str
+    session_id: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    answer: str
+    sources: List[str]
+    source_links: List[Optional[str]]
+    session_id: str
+
+
+class CourseStats(BaseModel):
+    total_courses: int
+    course_titles: List[str]
+
+
+class ClearSessionRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    session_id: str
+
+
+def get_rag(request: Request):
+    """RAG system dependency: the one the test_app fixture stores on app state"""
+    return request.app.state.rag_system
+
+
+# API endpoints, registered on test apps via include_router
+api_router = APIRouter()
+
+
+@api_router.post("/api/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest, rag_system=Depends(get_rag)):
+    try:
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag_system.session_manager.create_session()
+
+        answer, sources, source_links = await rag_system.aquery(
+            request.query, session_id
+        )
+
+        # Returned as-is; response_model only documents the schema
+        return ORJSONResponse(
+            {
+                "answer": answer,
+                "sources": sources,
+                "source_links": source_links,
+                "session_id": session_id,
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest, rag_system=Depends(get_rag)):
+    def event_stream():
+        try:
+            # Session creation can fail too; report it as an error event
+            session_id = request.session_id
+            if not session_id:
+                session_id = rag_system.session_manager.create_session()
+
+            yield json.dumps({"type": "session", "session_id": session_id}) + "\n"
+            for event in rag_system.query_stream(request.query, session_id):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
+@api_router.get("/api/courses", response_model=CourseStats)
+async def get_course_stats(rag_system=Depends(get_rag)):
+    try:
+        analytics = rag_system.get_course_analytics()
+        return ORJSONResponse(
+            {
+                "total_courses": analytics["total_courses"],
+                "course_titles": analytics["course_titles"],
+            }
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/api/session/clear")
+async def clear_session(request: ClearSessionRequest, rag_system=Depends(get_rag)):
+    try:
+        rag_system.session_manager.clear_session(request.session_id)
+        return {
+            "status": "success",
+            "message": f"Session {request.session_id} cleared",
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@pytest.fixture(scope="session")
+def _chroma_tmpdir(tmp_path_factory, worker_id):
+    """Per-run, per-xdist-worker Chroma directory so databases never collide"""
+    return tmp_path_factory.mktemp(f"chroma_{worker_id}")
+
+
+@functools.lru_cache(maxsize=None)
+def _build_config(api_key, chroma_path, embedding_model, max_results, model):
+    """Build (and memoize) a Config per unique set of test settings"""
     config = Config()
-    config.ANTHROPIC_API_KEY = "test-key"
-    config.CHROMA_PATH = "./test_chroma_db"
-    config.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-    config.MAX_RESULTS = 3
-    config.ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
+    config.ANTHROPIC_API_KEY = api_key
+    config.CHROMA_PATH = chroma_path
+    config.EMBEDDING_MODEL = embedding_model
+    config.MAX_RESULTS = max_results
+    config.ANTHROPIC_MODEL = model
     return config
 
 
+@pytest.fixture(scope="session")
+def test_config(_chroma_tmpdir):
+    """Test configuration with minimal settings; treat it as read-only"""
+    return _build_config(
+        "test-key",
+        str(_chroma_tmpdir),
+        "all-MiniLM-L6-v2",
+        3,
+        "claude-sonnet-4-20250514",
+    )
+
+
+def _search_result(documents=(), metadata=(), distances=(), error=None):
+    """Lightweight stand-in for SearchResults; the search tool only reads it"""
+    documents = list(documents)
+    return SimpleNamespace(
+        documents=documents,
+        metadata=list(metadata),
+        distances=list(distances),
+        error=error,
+        is_empty=lambda: not documents,
+    )
+
+
 @pytest.fixture
-def mock_vector_store():
-    """Mock vector store for testing"""
-    mock_store = Mock(spec=VectorStore)
+def make_search_result():
+    """Factory for search results to seed the mock vector store with"""
+    return _search_result
+
 
+def _configure_vector_store_mock(mock_store):
+    """Apply the default return values of the mock vector store"""
     # Mock the search method
-    mock_store.search.return_value = Mock(
+    mock_store.search.return_value = _search_result(
         documents=["Test document content", "Another test document"],
         metadata=[
             {"course_title": "Test Course", "lesson_number": 1},
             {"course_title": "Test Course", "lesson_number": 2},
         ],
         distances=[0.1, 0.2],
-        error=None,
-        is_empty=Mock(return_value=False),
     )
 
     # Mock course resolution
     mock_store._resolve_course_name.return_value = "Test Course"
 
+    # Start every test with no cached outlines
+    from vector_store import BoundedCache, VectorStore
+
+    mock_store.outline_cache = BoundedCache(VectorStore.OUTLINE_CACHE_SIZE)
+
     # Mock course catalog access
-    mock_store.course_catalog = Mock()
     mock_store.course_catalog.get.return_value = {
         "metadatas": [
             {
@@ -65,78 +224,169 @@ def mock_vector_store():
     # Mock link methods
     mock_store.get_lesson_link.return_value = "http://example.com/lesson/1"
     mock_store.get_course_link.return_value = "http://example.com/course"
+    mock_store.get_links_batch.side_effect = lambda pairs: [
+        (
+            "http://example.com/lesson/1"
+            if lesson_number is not None
+            else "http://example.com/course"
+        )
+        for _, lesson_number in pairs
+    ]
+
 
+@pytest.fixture(scope="class")
+def mock_vector_store():
+    """Mock vector store for testing, shared by the tests of a class"""
+    mock_store = Mock(spec=_vector_store_spec())
+    mock_store.course_catalog = Mock()
+    _configure_vector_store_mock(mock_store)
     return mock_store
 
 
-@pytest.fixture
-def real_vector_store(test_config):
-    """Real vector store for integration testing"""
+@pytest.fixture(autouse=True)
+def _reset_vector_store_mock(request):
+    """Restore the class-shared mock vector store to its defaults before each test"""
+    # Only touch the mock for tests that depend on it
+    if "mock_vector_store" not in request.fixturenames:
+        return
+    mock_vector_store = request.getfixturevalue("mock_vector_store")
+    mock_vector_store.reset_mock(return_value=True, side_effect=True)
+    _configure_vector_store_mock(mock_vector_store)
+
+
+@pytest.fixture(scope="session")
+def embedding_function(test_config):
+    """Sentence-transformer embedding function, loaded once per session"""
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+    try:
+        return SentenceTransformerEmbeddingFunction(
+            model_name=test_config.EMBEDDING_MODEL
+        )
+    except Exception as e:
+        pytest.skip(f"Cannot load embedding model: {e}")
+
+
+@pytest.fixture(scope="session")
+def _session_vector_store(test_config, embedding_function):
+    """Real in-memory vector store built once on the shared embedding model"""
+    from vector_store import VectorStore
+
     # Only create if we have the necessary components
     try:
         return VectorStore(
-            test_config.CHROMA_PATH,
+            None,
             test_config.EMBEDDING_MODEL,
             test_config.MAX_RESULTS,
+            embedding_function=embedding_function,
         )
     except Exception as e:
         pytest.skip(f"Cannot create real vector store: {e}")
 
 
+@pytest.fixture
+def real_vector_store(_session_vector_store):
+    """Real vector store for integration testing, emptied before each test"""
+    _session_vector_store.clear_all_data()
+    return _session_vector_store
+
+
 @pytest.fixture
 def course_search_tool(mock_vector_store):
     """CourseSearchTool with mock vector store"""
+    from search_tools import CourseSearchTool
+
     return CourseSearchTool(mock_vector_store)
 
 
-@pytest.fixture
+@pytest.fixture(scope="class")
 def course_outline_tool(mock_vector_store):
     """CourseOutlineTool with mock vector store"""
+    from search_tools import CourseOutlineTool
+
     return CourseOutlineTool(mock_vector_store)
 
 
 @pytest.fixture
 def tool_manager(course_search_tool, course_outline_tool):
     """ToolManager with registered tools"""
+    from search_tools import ToolManager
+
     manager = ToolManager()
-    manager.register_tool(course_search_tool)
-    manager.register_tool(course_outline_tool)
+    manager.register_tools([course_search_tool, course_outline_tool])
     return manager
 
 
 @pytest.fixture
 def mock_anthropic_client():
-    """Mock Anthropic client for testing"""
-    mock_client = Mock()
+    """Mock Anthropic client for testing, built fresh for each test"""
+    # Only the API calls record invocations; the rest is a static namespace.
+    # A new namespace is cheaper than reset_mock walking accumulated calls.
+    return SimpleNamespace(
+        messages=SimpleNamespace(
+            create=MagicMock(
+                return_value=SimpleNamespace(
+                    content=[SimpleNamespace(type="text", text="Test AI response")],
+                    stop_reason="end_turn",
+                )
+            ),
+            stream=MagicMock(),
+        )
+    )
 
-    # Mock successful response
-    mock_response = Mock()
-    mock_response.content = [Mock(text="Test AI response")]
-    mock_response.stop_reason = "end_turn"
 
-    mock_client.messages.create.return_value = mock_response
+@pytest.fixture(scope="module")
+def _module_ai_generator(test_config):
+    """AIGenerator built once per test module"""
+    from ai_generator import AIGenerator
 
-    return mock_client
+    return AIGenerator(
+        test_config.ANTHROPIC_API_KEY,
+        test_config.ANTHROPIC_MODEL,
+        max_history_tokens=test_config.MAX_HISTORY_TOKENS,
+    )
 
 
 @pytest.fixture
-def ai_generator_with_mock(test_config, mock_anthropic_client):
-    """AI Generator with mocked Anthropic client"""
-    generator = AIGenerator(test_config.ANTHROPIC_API_KEY, test_config.ANTHROPIC_MODEL)
+def ai_generator_with_mock(_module_ai_generator, mock_anthropic_client, test_config):
+    """AI Generator with mocked Anthropic client, restored before each test"""
+    generator = _module_ai_generator
     generator.client = mock_anthropic_client
+    generator.response_cache = None
+    generator.max_history_tokens = test_config.MAX_HISTORY_TOKENS
     return generator
 
 
+def _rag_response(answer=DEFAULT_ANSWER, sources=None, links=None):
+    """Build an (answer, sources, source_links) tuple as returned by RAG queries"""
+    return (
+        answer,
+        sources or list(DEFAULT_SOURCES),
+        links or list(DEFAULT_LINKS),
+    )
+
+
 @pytest.fixture
-def mock_rag_system(test_config):
-    """Mock RAG system for API testing"""
-    mock_rag = Mock(spec=RAGSystem)
+def make_rag_response():
+    """Factory for RAG query results to seed the mock RAG system with"""
+    return _rag_response
+
 
+def _configure_rag_mock(mock_rag):
+    """Apply the default return values of the mock RAG system"""
     # Mock successful query response
-    mock_rag.query.return_value = (
-        "This is a test response",
-        ["Source 1", "Source 2"],
-        ["http://example.com/lesson/1", "http://example.com/lesson/2"],
+    mock_rag.aquery.return_value = _rag_response()
+
+    # Mock streamed query response
+    mock_rag.query_stream.side_effect = lambda query, session_id: iter(
+        [
+            {"type": "text", "text": DEFAULT_ANSWER},
+            {
+                "type": "sources",
+                "sources": list(DEFAULT_SOURCES),
+                "source_links": list(DEFAULT_LINKS),
+            },
+        ]
     )
 
     # Mock course analytics
@@ -146,117 +396,126 @@ def mock_rag_system(test_config):
     }
 
     # Mock session manager
-    mock_session_manager = Mock()
-    mock_session_manager.create_session.return_value = "test-session-123"
-    mock_session_manager.clear_session.return_value = None
-    mock_rag.session_manager = mock_session_manager
+    mock_rag.session_manager.create_session.return_value = "test-session-123"
+    mock_rag.session_manager.clear_session.return_value = None
+
+
+def _rag_mock_methods(mock_rag):
+    """The call-recording methods of the mock RAG system"""
+    return (
+        mock_rag.aquery,
+        mock_rag.query_stream,
+        mock_rag.get_course_analytics,
+        mock_rag.session_manager.create_session,
+        mock_rag.session_manager.clear_session,
+    )
 
+
+@pytest.fixture(scope="session")
+def mock_rag_system():
+    """Mock RAG system for API testing, shared across the session"""
+    # Only the methods the endpoints call record invocations; the RAG system
+    # and its session manager are static namespaces, so reads are plain lookups
+    mock_rag = SimpleNamespace(
+        aquery=AsyncMock(),
+        query_stream=Mock(),
+        get_course_analytics=Mock(),
+        session_manager=SimpleNamespace(create_session=Mock(), clear_session=Mock()),
+    )
+    _configure_rag_mock(mock_rag)
     return mock_rag
 
 
-@pytest.fixture
-def test_app(mock_rag_system):
-    """FastAPI test app with mocked dependencies and no static files"""
-    from typing import List, Optional
-
-    from fastapi import FastAPI
-    from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.middleware.trustedhost import TrustedHostMiddleware
-    from pydantic import BaseModel
-
-    # Create minimal test app without static file mounting
-    app = FastAPI(title="Course Materials RAG System - Test", root_path="")
-
-    # Add middleware
-    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-        expose_headers=["*"],
+@pytest.fixture(autouse=True)
+def _reset_rag_mock(request):
+    """Restore the shared mock RAG system to its defaults before each test"""
+    # Only touch the mock for tests that depend on it
+    if "mock_rag_system" not in request.fixturenames:
+        return
+    mock_rag_system = request.getfixturevalue("mock_rag_system")
+    # Return values need no clearing: _configure_rag_mock reassigns every one
+    for method in _rag_mock_methods(mock_rag_system):
+        method.reset_mock(side_effect=True)
+    _configure_rag_mock(mock_rag_system)
+
+
+def pytest_addoption(parser):
+    """Register the opt-in flag for integration tests"""
+    parser.addoption(
+        "--integration",
+        action="store_true",
+        default=False,
+        help="run tests marked integration (real vector store, embedding model)",
     )
 
-    # Request/Response models
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
 
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[str]
-        source_links: List[Optional[str]]
-        session_id: str
+def pytest_collection_modifyitems(config, items):
+    """Deselect integration tests before their fixtures run, unless requested"""
+    if config.getoption("--integration"):
+        return
+    selected, deselected = [], []
+    for item in items:
+        if item.get_closest_marker("integration"):
+            deselected.append(item)
+        else:
+            selected.append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
 
-    class CourseStats(BaseModel):
-        total_courses: int
-        course_titles: List[str]
 
-    class ClearSessionRequest(BaseModel):
-        session_id: str
+_APP_KEY = pytest.StashKey[FastAPI]()
 
-    # API endpoints
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_documents(request: QueryRequest):
-        from fastapi import HTTPException
 
-        try:
-            session_id = request.session_id
-            if not session_id:
-                session_id = mock_rag_system.session_manager.create_session()
-
-            answer, sources, source_links = mock_rag_system.query(
-                request.query, session_id
-            )
-
-            return QueryResponse(
-                answer=answer,
-                sources=sources,
-                source_links=source_links,
-                session_id=session_id,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+def pytest_sessionstart(session):
+    """Build the test app once, before any fixture setup"""
+    # Create minimal test app without static file mounting or middleware
+    app = FastAPI(
+        title="Course Materials RAG System - Test",
+        root_path="",
+        default_response_class=ORJSONResponse,
+    )
+    app.include_router(api_router)
+    session.stash[_APP_KEY] = app
 
-    @app.get("/api/courses", response_model=CourseStats)
-    async def get_course_stats():
-        from fastapi import HTTPException
 
-        try:
-            analytics = mock_rag_system.get_course_analytics()
-            return CourseStats(
-                total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"],
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+@pytest.fixture(scope="session")
+def test_app(request, mock_rag_system):
+    """FastAPI test app with mocked dependencies and no static files"""
+    app = request.session.stash[_APP_KEY]
+    app.state.rag_system = mock_rag_system
+    return app
 
-    @app.post("/api/session/clear")
-    async def clear_session(request: ClearSessionRequest):
-        from fastapi import HTTPException
 
-        try:
-            mock_rag_system.session_manager.clear_session(request.session_id)
-            return {
-                "status": "success",
-                "message": f"Session {request.session_id} cleared",
-            }
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+def _shared_async_client(app):
+    """
+    Async client over ASGI that lives for the whole session.
 
-    return app
+    ASGITransport keeps no connections or loop-bound state, so one client can
+    serve every test's event loop; only closing it needs a loop of its own.
+    """
+    ac = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+    yield ac
+    asyncio.run(ac.aclose())
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client(test_app):
-    """FastAPI test client"""
-    return TestClient(test_app)
+    """Async test client dispatching straight to the app over ASGI"""
+    yield from _shared_async_client(test_app)
 
 
-@pytest.fixture
-def temp_directory():
-    """Temporary directory for testing"""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir)
+@pytest.fixture(scope="session")
+def cors_app(test_app):
+    """Test app wrapped in the production CORS middleware"""
+    from config import config
+    from fastapi.middleware.cors import CORSMiddleware
+
+    # Same settings app.py installs, so a production CORS change shows up here
+    return CORSMiddleware(test_app, **config.CORS_SETTINGS)
+
+
+@pytest.fixture(scope="session")
+def cors_client(cors_app):
+    """Async test client for the CORS-wrapped app"""
+    yield from _shared_async_client(cors_app)
@@ -0,0 +1,5 @@
+"""Default query result of the mock RAG system, shared by conftest and tests"""
+
+DEFAULT_ANSWER = "This is a test response"
+DEFAULT_SOURCES = ("Source 1", "Source 2")
+DEFAULT_LINKS = ("http://example.com/lesson/1", "http://example.com/lesson/2")
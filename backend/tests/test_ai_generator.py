@@ -1,7 +1,141 @@
-from unittest.mock import MagicMock, Mock, patch
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, Mock, call, patch
 
 import pytest
-from ai_generator import AIGenerator
+from ai_generator import AIGenerator, AsyncAIGenerator
+from config import config
+from response_cache import CachedResponse
+from search_tools import ToolOutput
+
+
+def tool_block(name, input, id):
+    """Lightweight tool_use content block; the generator only reads attributes"""
+    return SimpleNamespace(type="tool_use", name=name, input=input, id=id)
+
+
+def text_block(text):
+    """Lightweight text content block"""
+    return SimpleNamespace(type="text", text=text)
+
+
+def text_response(text, stop_reason="end_turn"):
+    """Lightweight final API response carrying a single text block"""
+    return SimpleNamespace(content=[text_block(text)], stop_reason=stop_reason)
+
+
+def tool_use_response(name, input, id):
+    """Lightweight API response requesting a single tool call"""
+    return SimpleNamespace(
+        content=[tool_block(name, input, id)], stop_reason="tool_use"
+    )
+
+
+def responses(*specs):
+    """Yield API responses lazily so calls that never happen build nothing"""
+    for spec in specs:
+        yield text_response(**spec) if "text" in spec else tool_use_response(**spec)
+
+
+SEARCH_TOOL = {"name": "search_course_content", "description": "Search tool"}
+OUTLINE_TOOL = {"name": "get_course_outline", "description": "Get course outline"}
+
+# Each scenario scripts the API responses and tool results for one query
+ANTHROPIC_SCENARIOS = [
+    pytest.param(
+        {
+            "query": "What is Python?",
+            "tools": [SEARCH_TOOL],
+            "responses": [{"text": "I can answer this directly without tools"}],
+            "tool_results": [],
+            "expected": "I can answer this directly without tools",
+            "tool_calls": [],
+        },
+        id="no-tool-use",
+    ),
+    pytest.param(
+        {
+            "query": "Search for Python content",
+            "tools": [SEARCH_TOOL],
+            "responses": [
+                {
+                    "name": "search_course_content",
+                    "input": {"query": "Python basics"},
+                    "id": "tool_use_123",
+                },
+                {"text": "Final response with tool results"},
+            ],
+            "tool_results": [ToolOutput("Tool execution result")],
+            "expected": "Final response with tool results",
+            "tool_calls": [call("search_course_content", query="Python basics")],
+        },
+        id="single-tool-round",
+    ),
+    pytest.param(
+        {
+            "query": "What topics are covered in lesson 4 of Python Course?",
+            "tools": [OUTLINE_TOOL, SEARCH_TOOL],
+            "responses": [
+                # Round 1: AI uses outline tool
+                {
+                    "name": "get_course_outline",
+                    "input": {"course_title": "Python Course"},
+                    "id": "tool_1",
+                },
+                # Round 2: AI uses search tool based on outline results
+                {
+                    "name": "search_course_content",
+                    "input": {"query": "lesson 4 content"},
+                    "id": "tool_2",
+                },
+                # Round 3: final response (max rounds reached)
+                {"text": "Based on the outline and lesson content, the answer..."},
+            ],
+            "tool_results": [
+                ToolOutput("Course outline with lesson 4: Advanced Functions"),
+                ToolOutput(
+                    "Lesson 4 content about advanced functions",
+                    ["Python Course - Lesson 4"],
+                    ["http://lesson4"],
+                ),
+            ],
+            "expected": "Based on the outline and lesson content, the answer...",
+            "tool_calls": [
+                call("get_course_outline", course_title="Python Course"),
+                call("search_course_content", query="lesson 4 content"),
+            ],
+        },
+        id="two-tool-rounds",
+    ),
+    pytest.param(
+        {
+            "query": "Query that triggers tool failure",
+            "tools": [{"name": "failing_tool", "description": "Tool that fails"}],
+            "responses": [
+                {"name": "failing_tool", "input": {"param": "value"}, "id": "tool_1"},
+                {"text": "Response despite tool failure"},
+            ],
+            "tool_results": Exception("Tool execution failed"),
+            "expected": "Response despite tool failure",
+            "tool_calls": [call("failing_tool", param="value")],
+        },
+        id="tool-execution-error",
+    ),
+]
+
+
+@pytest.fixture(params=ANTHROPIC_SCENARIOS)
+def anthropic_scenario(request, mock_anthropic_client):
+    """Scripted API responses plus a tool manager returning the scripted results"""
+    scenario = request.param
+    mock_anthropic_client.messages.create.side_effect = responses(
+        *scenario["responses"]
+    )
+
+    tool_manager = Mock()
+    tool_manager.run_tool.side_effect = scenario["tool_results"]
+
+    return {**scenario, "tool_manager": tool_manager}
 
 
 class TestAIGenerator:
@@ -18,14 +152,29 @@ class TestAIGenerator:
         assert generator.base_params["temperature"] == 0
         assert generator.base_params["max_tokens"] == 800
 
+    def test_slotted_instance(self, test_config):
+        """Test that AIGenerator instances carry no per-instance __dict__"""
+        generator = AIGenerator(
+            test_config.ANTHROPIC_API_KEY, test_config.ANTHROPIC_MODEL
+        )
+
+        assert not hasattr(generator, "__dict__")
+
+    def test_client_shared_per_api_key(self, test_config):
+        """Test that generators with the same API key reuse one client"""
+        first = AIGenerator("shared-key", test_config.ANTHROPIC_MODEL)
+        second = AIGenerator("shared-key", test_config.ANTHROPIC_MODEL)
+        other = AIGenerator("other-key", test_config.ANTHROPIC_MODEL)
+
+        assert first.client is second.client
+        assert first.client is not other.client
+
     def test_generate_response_without_tools(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
         """Test basic response generation without tools"""
         # Setup mock response
-        mock_response = Mock()
-        mock_response.content = [Mock(text="This is a test response")]
-        mock_response.stop_reason = "end_turn"
+        mock_response = text_response("This is a test response")
         mock_anthropic_client.messages.create.return_value = mock_response
 
         result = ai_generator_with_mock.generate_response("What is Python?")
@@ -36,14 +185,14 @@ class TestAIGenerator:
         call_args = mock_anthropic_client.messages.create.call_args
         assert call_args[1]["messages"][0]["content"] == "What is Python?"
         assert "tools" not in call_args[1]
+        assert call_args[1]["system"] == [AIGenerator.SYSTEM_BLOCK]
+        assert call_args[1]["system"][0]["cache_control"] == {"type": "ephemeral"}
 
     def test_generate_response_with_conversation_history(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
         """Test response generation with conversation history"""
-        mock_response = Mock()
-        mock_response.content = [Mock(text="Response with history")]
-        mock_response.stop_reason = "end_turn"
+        mock_response = text_response("Response with history")
         mock_anthropic_client.messages.create.return_value = mock_response
 
         history = "User: Previous question\nAssistant: Previous answer"
@@ -53,20 +202,72 @@ class TestAIGenerator:
 
         assert result == "Response with history"
 
-        # Verify history is included in system content
+        # Verify history follows the cached system prompt block
         call_args = mock_anthropic_client.messages.create.call_args
         system_content = call_args[1]["system"]
-        assert "Previous conversation:" in system_content
-        assert history in system_content
+        assert system_content[0] == AIGenerator.SYSTEM_BLOCK
+        assert "Previous conversation:" in system_content[1]["text"]
+        assert history in system_content[1]["text"]
+        assert "cache_control" not in system_content[1]
+
+    def test_long_history_truncated_to_token_budget(
+        self, ai_generator_with_mock, mock_anthropic_client
+    ):
+        """Test that history beyond the token budget keeps only recent lines"""
+        ai_generator_with_mock.max_history_tokens = 10  # ~40 characters
+        history = "\n".join(
+            ["User: old question", "Assistant: old answer", "User: recent"]
+        )
+
+        ai_generator_with_mock.generate_response("Next", conversation_history=history)
+
+        call_args = mock_anthropic_client.messages.create.call_args
+        history_text = call_args[1]["system"][1]["text"]
+        assert "User: recent" in history_text
+        assert "Assistant: old answer" in history_text
+        assert "old question" not in history_text
+
+    def test_short_history_not_truncated(self, ai_generator_with_mock):
+        """Test that history within the budget is passed through unchanged"""
+        history = "User: Hi\nAssistant: Hello"
+
+        assert ai_generator_with_mock._truncate_history(history) is history
+
+    def test_single_long_line_truncated_to_tail(self, ai_generator_with_mock):
+        """Test that one over-long line keeps its most recent characters"""
+        ai_generator_with_mock.max_history_tokens = 2
+
+        assert ai_generator_with_mock._truncate_history("x" * 20 + "tail") == (
+            "xxxxtail"
+        )
+
+    def test_system_content_reused_across_calls(
+        self, ai_generator_with_mock, mock_anthropic_client
+    ):
+        """Test that system content is shared rather than rebuilt per call"""
+        history = "User: Previous question\nAssistant: Previous answer"
+
+        ai_generator_with_mock.generate_response("First")
+        ai_generator_with_mock.generate_response("Second")
+        ai_generator_with_mock.generate_response("Third", conversation_history=history)
+        ai_generator_with_mock.generate_response("Fourth", conversation_history=history)
+
+        systems = [
+            call[1]["system"]
+            for call in mock_anthropic_client.messages.create.call_args_list
+        ]
+        assert systems[0] is AIGenerator.BASE_SYSTEM_CONTENT
+        assert systems[1] is AIGenerator.BASE_SYSTEM_CONTENT
+        # The prompt block is shared even when history follows it
+        assert systems[2][0] is AIGenerator.SYSTEM_BLOCK
+        assert systems[3][0] is AIGenerator.SYSTEM_BLOCK
 
     def test_generate_response_with_tools_no_tool_use(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
         """Test response generation with tools available but not used"""
         # Setup mock response that doesn't use tools
-        mock_response = Mock()
-        mock_response.content = [Mock(text="Direct answer without tools")]
-        mock_response.stop_reason = "end_turn"
+        mock_response = text_response("Direct answer without tools")
         mock_anthropic_client.messages.create.return_value = mock_response
 
         tools = [{"name": "test_tool", "description": "Test tool"}]
@@ -84,468 +285,570 @@ class TestAIGenerator:
         assert call_args[1]["tool_choice"] == {"type": "auto"}
 
         # Verify tool manager was not called
-        tool_manager.execute_tool.assert_not_called()
+        tool_manager.run_tool.assert_not_called()
 
-    def test_generate_response_with_tool_use(
+    def test_parallel_tool_use_blocks_run_concurrently(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test response generation when AI uses tools"""
-        # Setup mock initial response with tool use
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.input = {"query": "Python basics"}
-        mock_tool_block.id = "tool_use_123"
-
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_block]
-        mock_initial_response.stop_reason = "tool_use"
-
-        # Setup mock final response after tool execution
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock(text="Final response with tool results")]
-
-        # Setup mock client to return different responses
+        """Test that multiple tool_use blocks in one response execute in parallel"""
+        import threading
+
+        blocks = []
+        for i, course in enumerate(["Course A", "Course B"]):
+            block = tool_block(
+                "search_course_content",
+                {"query": "topic", "course_name": course},
+                f"tool_{i}",
+            )
+            blocks.append(block)
+
+        mock_initial_response = SimpleNamespace(content=blocks)
+        mock_final_response = SimpleNamespace(content=[text_block("Comparison")])
         mock_anthropic_client.messages.create.side_effect = [
             mock_initial_response,
             mock_final_response,
         ]
 
-        # Setup mock tool manager
-        tool_manager = Mock()
-        tool_manager.execute_tool.return_value = "Tool execution result"
+        # Each call waits for the other; sequential execution would time out
+        barrier = threading.Barrier(2, timeout=5)
 
-        tools = [{"name": "search_course_content", "description": "Search tool"}]
+        def run_tool(name, **kwargs):
+            barrier.wait()
+            return ToolOutput(f"Results for {kwargs['course_name']}")
+
+        tool_manager = Mock()
+        tool_manager.run_tool.side_effect = run_tool
 
         result = ai_generator_with_mock.generate_response(
-            "Search for Python content", tools=tools, tool_manager=tool_manager
+            "Compare courses", tools=[{"name": "x"}], tool_manager=tool_manager
         )
 
-        assert result == "Final response with tool results"
+        assert result == "Comparison"
+        second_call = mock_anthropic_client.messages.create.call_args_list[1]
+        tool_results = second_call[1]["messages"][2]["content"]
+        assert [r["tool_use_id"] for r in tool_results] == ["tool_0", "tool_1"]
+        assert [r["content"] for r in tool_results] == [
+            "Results for Course A",
+            "Results for Course B",
+        ]
 
-        # Verify tool execution was called
-        tool_manager.execute_tool.assert_called_once_with(
-            "search_course_content", query="Python basics"
-        )
 
-        # Verify two API calls were made
-        assert mock_anthropic_client.messages.create.call_count == 2
+class TestSequentialToolCalling:
+    """Test suite for sequential tool calling functionality"""
 
-    def test_handle_tool_execution_single_tool(
-        self, ai_generator_with_mock, mock_anthropic_client
+    def test_tool_calling_scenario(
+        self, ai_generator_with_mock, mock_anthropic_client, anthropic_scenario
     ):
-        """Test tool execution handling with single tool"""
-        # Setup mock tool use response
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "test_tool"
-        mock_tool_block.input = {"param": "value"}
-        mock_tool_block.id = "tool_123"
-
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_block]
-
-        # Setup mock final response
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock(text="Response after tool use")]
-        mock_anthropic_client.messages.create.return_value = mock_final_response
-
-        # Setup mock tool manager
-        tool_manager = Mock()
-        tool_manager.execute_tool.return_value = "Tool result"
-
-        base_params = {
-            "messages": [{"role": "user", "content": "Test query"}],
-            "system": "Test system prompt",
-        }
-
-        result = ai_generator_with_mock._handle_tool_execution(
-            mock_initial_response, base_params, tool_manager
+        """Test that each scripted scenario ends with the expected answer"""
+        result = ai_generator_with_mock.generate_response(
+            anthropic_scenario["query"],
+            tools=anthropic_scenario["tools"],
+            tool_manager=anthropic_scenario["tool_manager"],
         )
 
-        assert result == "Response after tool use"
+        assert result == anthropic_scenario["expected"]
 
-        # Verify tool was executed
-        tool_manager.execute_tool.assert_called_once_with("test_tool", param="value")
+        # One API call per scripted response, one tool call per tool round
+        assert mock_anthropic_client.messages.create.call_count == len(
+            anthropic_scenario["responses"]
+        )
+        tool_manager = anthropic_scenario["tool_manager"]
+        assert tool_manager.run_tool.call_args_list == (
+            anthropic_scenario["tool_calls"]
+        )
 
-        # Verify final API call structure
-        call_args = mock_anthropic_client.messages.create.call_args
-        messages = call_args[1]["messages"]
-
-        # Should have: original user message, assistant tool use, user tool results
-        assert len(messages) == 3
-        assert messages[0]["role"] == "user"
-        assert messages[1]["role"] == "assistant"
-        assert messages[2]["role"] == "user"
-        assert messages[2]["content"][0]["type"] == "tool_result"
-        assert messages[2]["content"][0]["tool_use_id"] == "tool_123"
-        assert messages[2]["content"][0]["content"] == "Tool result"
-
-    def test_handle_tool_execution_multiple_tools(
+    def test_answer_collects_sources_across_rounds(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test tool execution handling with multiple tools"""
-        # Setup multiple tool blocks
-        mock_tool_block1 = Mock()
-        mock_tool_block1.type = "tool_use"
-        mock_tool_block1.name = "tool1"
-        mock_tool_block1.input = {"param1": "value1"}
-        mock_tool_block1.id = "tool_1"
-
-        mock_tool_block2 = Mock()
-        mock_tool_block2.type = "tool_use"
-        mock_tool_block2.name = "tool2"
-        mock_tool_block2.input = {"param2": "value2"}
-        mock_tool_block2.id = "tool_2"
-
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_block1, mock_tool_block2]
-
-        # Setup mock tool manager
-        tool_manager = Mock()
-        tool_manager.execute_tool.side_effect = ["Result 1", "Result 2"]
-
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock(text="Final response")]
-        mock_anthropic_client.messages.create.return_value = mock_final_response
-
-        base_params = {
-            "messages": [{"role": "user", "content": "Test query"}],
-            "system": "Test system prompt",
-        }
-
-        result = ai_generator_with_mock._handle_tool_execution(
-            mock_initial_response, base_params, tool_manager
+        """Test that sources from every tool call are returned with the answer"""
+        mock_anthropic_client.messages.create.side_effect = responses(
+            {"name": "search_tool", "input": {"query": "a"}, "id": "tool_1"},
+            {"name": "search_tool", "input": {"query": "b"}, "id": "tool_2"},
+            {"text": "Answer"},
         )
 
-        # Verify both tools were executed
-        assert tool_manager.execute_tool.call_count == 2
-        tool_manager.execute_tool.assert_any_call("tool1", param1="value1")
-        tool_manager.execute_tool.assert_any_call("tool2", param2="value2")
-
-        # Verify tool results structure
-        call_args = mock_anthropic_client.messages.create.call_args
-        tool_results = call_args[1]["messages"][2]["content"]
-        assert len(tool_results) == 2
-        assert tool_results[0]["tool_use_id"] == "tool_1"
-        assert tool_results[1]["tool_use_id"] == "tool_2"
+        tool_manager = Mock()
+        tool_manager.run_tool.side_effect = [
+            ToolOutput("A", ["Course A - Lesson 1"], ["http://a1"]),
+            ToolOutput("B", ["Course B"], [None]),
+        ]
 
+        answer = ai_generator_with_mock.generate_answer(
+            "Query", tools=[{"name": "search_tool"}], tool_manager=tool_manager
+        )
 
-class TestSequentialToolCalling:
-    """Test suite for sequential tool calling functionality"""
+        assert answer.text == "Answer"
+        assert answer.sources == ["Course A - Lesson 1", "Course B"]
+        assert answer.source_links == ["http://a1", None]
 
-    def test_sequential_tool_calling_two_rounds(
+    def test_sequential_tool_calling_max_rounds_reached(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test successful two-round tool calling scenario"""
-        # Setup mock responses for two rounds
-
-        # Round 1: AI uses outline tool
-        mock_tool_block_1 = Mock()
-        mock_tool_block_1.type = "tool_use"
-        mock_tool_block_1.name = "get_course_outline"
-        mock_tool_block_1.input = {"course_title": "Python Course"}
-        mock_tool_block_1.id = "tool_1"
-
-        mock_round1_response = Mock()
-        mock_round1_response.content = [mock_tool_block_1]
-        mock_round1_response.stop_reason = "tool_use"
-
-        # Round 2: AI uses search tool based on outline results
-        mock_tool_block_2 = Mock()
-        mock_tool_block_2.type = "tool_use"
-        mock_tool_block_2.name = "search_course_content"
-        mock_tool_block_2.input = {"query": "lesson 4 content"}
-        mock_tool_block_2.id = "tool_2"
-
-        mock_round2_response = Mock()
-        mock_round2_response.content = [mock_tool_block_2]
-        mock_round2_response.stop_reason = "tool_use"
-
-        # Final response without tools (Round 3 - after max rounds reached)
-        mock_text_block = Mock(
-            text="Based on the course outline and lesson content, here's the answer..."
-        )
-        mock_final_response = Mock()
-        mock_final_response.content = [mock_text_block]
-        mock_final_response.stop_reason = "end_turn"
-
-        # Configure mock client for sequential responses
-        mock_anthropic_client.messages.create.side_effect = [
-            mock_round1_response,  # Round 1: tool use
-            mock_round2_response,  # Round 2: tool use
-            mock_final_response,  # Round 3: final response (max rounds reached)
-        ]
+        """Test that sequential calling respects max rounds limit"""
+        mock_anthropic_client.messages.create.side_effect = responses(
+            # Round 1: AI uses tool
+            {"name": "search_tool", "input": {"query": "search 1"}, "id": "tool_1"},
+            # Round 2: AI tries to use tool again but hits max rounds
+            {"name": "search_tool", "input": {"query": "search 2"}, "id": "tool_2"},
+            # Final call: no tools available
+            {"text": "Final response after max rounds"},
+        )
 
-        # Setup mock tool manager
         tool_manager = Mock()
-        tool_manager.execute_tool.side_effect = [
-            "Course outline with lesson 4: Advanced Functions",
-            "Lesson 4 content about advanced functions",
+        tool_manager.run_tool.side_effect = [
+            ToolOutput("Tool result 1"),
+            ToolOutput("Tool result 2"),
         ]
 
-        tools = [
-            {"name": "get_course_outline", "description": "Get course outline"},
-            {"name": "search_course_content", "description": "Search course content"},
-        ]
+        tools = [{"name": "search_tool", "description": "Search tool"}]
 
         result = ai_generator_with_mock.generate_response(
-            "What topics are covered in lesson 4 of Python Course?",
+            "Complex query requiring multiple searches",
             tools=tools,
             tool_manager=tool_manager,
         )
 
         # Verify final response
-        assert (
-            result
-            == "Based on the course outline and lesson content, here's the answer..."
-        )
+        assert result == "Final response after max rounds"
 
-        # Verify three API calls were made (2 tool rounds + 1 final)
+        # Verify exactly 3 API calls (2 tool rounds + 1 final)
         assert mock_anthropic_client.messages.create.call_count == 3
 
+        # Verify first two rounds had tools, final round did not
+        call_args_round1 = mock_anthropic_client.messages.create.call_args_list[0]
+        call_args_round2 = mock_anthropic_client.messages.create.call_args_list[1]
+        call_args_final = mock_anthropic_client.messages.create.call_args_list[2]
+
+        # Rounds 1 and 2 should have tools
+        assert "tools" in call_args_round1[1]
+        assert "tools" in call_args_round2[1]
+        # Final round should not have tools
+        assert "tools" not in call_args_final[1]
+
         # Verify both tools were executed
-        assert tool_manager.execute_tool.call_count == 2
-        tool_manager.execute_tool.assert_any_call(
-            "get_course_outline", course_title="Python Course"
+        assert tool_manager.run_tool.call_count == 2
+
+
+class TestAIGeneratorErrorHandling:
+    """Test error handling in AI Generator"""
+
+    def test_anthropic_api_error(self, ai_generator_with_mock, mock_anthropic_client):
+        """Test handling of Anthropic API errors"""
+        # Setup mock to raise an exception
+        mock_anthropic_client.messages.create.side_effect = Exception("API Error")
+
+        result = ai_generator_with_mock.generate_response("Test query")
+
+        # Should return user-friendly error message instead of raising exception
+        assert "I encountered an issue while processing your request" in result
+        assert "API Error" in result
+
+    def test_tool_execution_error(self, ai_generator_with_mock):
+        """Test that a failing tool is reported as a result and ends the loop"""
+        mock_tool_block = tool_block("failing_tool", {"param": "value"}, "tool_123")
+
+        mock_response = SimpleNamespace(content=[mock_tool_block])
+
+        tool_manager = Mock()
+        tool_manager.run_tool.side_effect = Exception("Tool execution failed")
+
+        round_state = ai_generator_with_mock._build_round_state(
+            "Test query", None, None, None
+        )
+        ai_generator_with_mock._prepare_next_round(
+            mock_response, round_state, tool_manager
+        )
+
+        assert round_state.tool_execution_failed is True
+        tool_result = round_state.messages[2]["content"][0]
+        assert tool_result["tool_use_id"] == "tool_123"
+        assert tool_result["content"] == "Tool execution failed: Tool execution failed"
+
+    def test_malformed_tool_response(self, ai_generator_with_mock):
+        """Test handling of responses without tool_use blocks"""
+        mock_text_block = text_block("Some text")
+
+        # No tool_use blocks
+        mock_response = SimpleNamespace(content=[mock_text_block])
+
+        tool_manager = Mock()
+
+        round_state = ai_generator_with_mock._build_round_state(
+            "Test query", None, None, None
         )
-        tool_manager.execute_tool.assert_any_call(
-            "search_course_content", query="lesson 4 content"
+        ai_generator_with_mock._prepare_next_round(
+            mock_response, round_state, tool_manager
         )
 
-    def test_sequential_tool_calling_terminates_after_first_round_no_tools(
+        # No tools should be executed and no tool results appended
+        tool_manager.run_tool.assert_not_called()
+        assert len(round_state.messages) == 2
+        assert round_state.tool_execution_failed is False
+
+
+class TestAIGeneratorResponseCache:
+    """Test semantic response cache integration"""
+
+    def test_cache_hit_skips_api_call(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test that sequential calling terminates when AI doesn't use tools in first round"""
-        # Round 1: AI responds without using tools
-        mock_text_block = Mock(text="I can answer this directly without tools")
-        mock_response = Mock()
-        mock_response.content = [mock_text_block]
-        mock_response.stop_reason = "end_turn"
+        """Test that a cache hit returns the cached answer and its sources"""
+        mock_cache = Mock()
+        mock_cache.lookup.return_value = (
+            CachedResponse("Cached answer", ["Course A - Lesson 1"], ["http://a1"]),
+            [0.1, 0.2],
+        )
+        ai_generator_with_mock.response_cache = mock_cache
 
-        mock_anthropic_client.messages.create.return_value = mock_response
+        answer = ai_generator_with_mock.generate_answer(
+            "What is Python?", conversation_history="User: Hi"
+        )
 
-        tool_manager = Mock()
-        tools = [{"name": "test_tool", "description": "Test tool"}]
+        assert answer.text == "Cached answer"
+        assert answer.sources == ["Course A - Lesson 1"]
+        assert answer.source_links == ["http://a1"]
+        mock_cache.lookup.assert_called_once_with("What is Python?", "User: Hi", None)
+        mock_anthropic_client.messages.create.assert_not_called()
+        mock_cache.store.assert_not_called()
 
+    def test_cache_miss_stores_final_text(
+        self, ai_generator_with_mock, mock_anthropic_client
+    ):
+        """Test that a cache miss stores the generated answer with its context"""
+        mock_cache = Mock()
+        mock_cache.lookup.return_value = (None, [0.1, 0.2])
+        ai_generator_with_mock.response_cache = mock_cache
+
+        tools = [{"name": "test_tool"}]
         result = ai_generator_with_mock.generate_response(
-            "What is Python?", tools=tools, tool_manager=tool_manager
+            "What is Python?", tools=tools, tool_manager=Mock()
         )
 
-        # Verify response
-        assert result == "I can answer this directly without tools"
+        assert result == "Test AI response"
+        mock_anthropic_client.messages.create.assert_called_once()
+        mock_cache.store.assert_called_once_with(
+            "What is Python?", [0.1, 0.2], "Test AI response", None, tools, [], []
+        )
 
-        # Verify only one API call was made
-        assert mock_anthropic_client.messages.create.call_count == 1
+    def test_cache_keyed_on_cache_query(
+        self, ai_generator_with_mock, mock_anthropic_client
+    ):
+        """Test that the cache sees the raw question, not the templated prompt"""
+        mock_cache = Mock()
+        mock_cache.lookup.return_value = (None, [0.1, 0.2])
+        ai_generator_with_mock.response_cache = mock_cache
+
+        ai_generator_with_mock.generate_answer(
+            "Answer this question about course materials: What is MCP?",
+            cache_query="What is MCP?",
+        )
 
-        # Verify no tools were executed
-        tool_manager.execute_tool.assert_not_called()
+        mock_cache.lookup.assert_called_once_with("What is MCP?", None, None)
+        assert mock_cache.store.call_args[0][0] == "What is MCP?"
+        sent = mock_anthropic_client.messages.create.call_args[1]["messages"]
+        assert sent[0]["content"].startswith("Answer this question")
 
-    def test_sequential_tool_calling_max_rounds_reached(
+    def test_api_error_not_cached(self, ai_generator_with_mock, mock_anthropic_client):
+        """Test that error responses are never written to the cache"""
+        mock_cache = Mock()
+        mock_cache.lookup.return_value = (None, [0.1, 0.2])
+        ai_generator_with_mock.response_cache = mock_cache
+        mock_anthropic_client.messages.create.side_effect = Exception("API Error")
+
+        result = ai_generator_with_mock.generate_response("Test query")
+
+        assert "API Error" in result
+        mock_cache.store.assert_not_called()
+
+    def test_tool_failure_not_cached(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test that sequential calling respects max rounds limit"""
-        # Round 1: AI uses tool
-        mock_tool_block_1 = Mock()
-        mock_tool_block_1.type = "tool_use"
-        mock_tool_block_1.name = "search_tool"
-        mock_tool_block_1.input = {"query": "search 1"}
-        mock_tool_block_1.id = "tool_1"
-
-        mock_round1_response = Mock()
-        mock_round1_response.content = [mock_tool_block_1]
-        mock_round1_response.stop_reason = "tool_use"
-
-        # Round 2: AI tries to use tool again but hits max rounds
-        mock_tool_block_2 = Mock()
-        mock_tool_block_2.type = "tool_use"
-        mock_tool_block_2.name = "search_tool"
-        mock_tool_block_2.input = {"query": "search 2"}
-        mock_tool_block_2.id = "tool_2"
-
-        mock_round2_response = Mock()
-        mock_round2_response.content = [mock_tool_block_2]
-        mock_round2_response.stop_reason = "tool_use"
-
-        # Final response after max rounds (no tools available)
-        mock_text_block = Mock(text="Final response after max rounds")
-        mock_final_response = Mock()
-        mock_final_response.content = [mock_text_block]
-        mock_final_response.stop_reason = "end_turn"
-
+        """Test that an answer cut short by a failed tool is never cached"""
+        mock_cache = Mock()
+        mock_cache.lookup.return_value = (None, [0.1, 0.2])
+        ai_generator_with_mock.response_cache = mock_cache
+        # After the failure Claude retries; the loop stops on that tool_use turn
         mock_anthropic_client.messages.create.side_effect = [
-            mock_round1_response,  # Round 1: tool use
-            mock_round2_response,  # Round 2: tool use (max rounds)
-            mock_final_response,  # Final call: no tools
+            tool_use_response("search_course_content", {"query": "q"}, "tool_1"),
+            SimpleNamespace(
+                content=[
+                    text_block("Let me try again."),
+                    tool_block("search_course_content", {"query": "q"}, "tool_2"),
+                ]
+            ),
         ]
-
         tool_manager = Mock()
-        tool_manager.execute_tool.side_effect = ["Tool result 1", "Tool result 2"]
-
-        tools = [{"name": "search_tool", "description": "Search tool"}]
+        tool_manager.run_tool.side_effect = Exception("Search failed")
 
         result = ai_generator_with_mock.generate_response(
-            "Complex query requiring multiple searches",
-            tools=tools,
-            tool_manager=tool_manager,
+            "Search", tools=[SEARCH_TOOL], tool_manager=tool_manager
         )
 
-        # Verify final response
-        assert result == "Final response after max rounds"
+        assert result == "Let me try again."
+        mock_cache.store.assert_not_called()
 
-        # Verify exactly 3 API calls (2 tool rounds + 1 final)
-        assert mock_anthropic_client.messages.create.call_count == 3
 
-        # Verify first two rounds had tools, final round did not
-        call_args_round1 = mock_anthropic_client.messages.create.call_args_list[0]
-        call_args_round2 = mock_anthropic_client.messages.create.call_args_list[1]
-        call_args_final = mock_anthropic_client.messages.create.call_args_list[2]
+class TestAIGeneratorStreaming:
+    """Test streaming response generation"""
 
-        # Rounds 1 and 2 should have tools
-        assert "tools" in call_args_round1[1]
-        assert "tools" in call_args_round2[1]
-        # Final round should not have tools
-        assert "tools" not in call_args_final[1]
+    @staticmethod
+    def _mock_stream(events, final_message):
+        """Build a mock messages.stream() context manager"""
+        stream = MagicMock()
+        stream.__enter__.return_value = stream
+        stream.__iter__.return_value = iter(events)
+        stream.get_final_message.return_value = final_message
+        return stream
 
-        # Verify both tools were executed
-        assert tool_manager.execute_tool.call_count == 2
+    def test_stream_without_tools(self, ai_generator_with_mock, mock_anthropic_client):
+        """Test that text deltas are yielded as they arrive"""
+        final_message = SimpleNamespace(content=[text_block("Hello world")])
+        mock_anthropic_client.messages.stream.return_value = self._mock_stream(
+            [text_block("Hello"), text_block(" world")],
+            final_message,
+        )
+
+        chunks = list(ai_generator_with_mock.generate_response_stream("Hi"))
 
-    def test_sequential_tool_calling_with_tool_execution_error(
+        assert chunks == ["Hello", " world"]
+        mock_anthropic_client.messages.create.assert_not_called()
+
+    def test_stream_starts_tool_on_block_stop(
         self, ai_generator_with_mock, mock_anthropic_client
     ):
-        """Test handling of tool execution errors in sequential rounds"""
-        # Round 1: AI uses tool that fails
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "failing_tool"
-        mock_tool_block.input = {"param": "value"}
-        mock_tool_block.id = "tool_1"
-
-        mock_round1_response = Mock()
-        mock_round1_response.content = [mock_tool_block]
-        mock_round1_response.stop_reason = "tool_use"
-
-        # Round 2: Final response after tool failure
-        mock_text_block = Mock(text="Response despite tool failure")
-        mock_final_response = Mock()
-        mock_final_response.content = [mock_text_block]
-        mock_final_response.stop_reason = "end_turn"
+        """Test that tools run from the stream and results feed the next round"""
+        mock_tool_block = tool_block(
+            "search_course_content", {"query": "Python basics"}, "tool_use_123"
+        )
 
-        mock_anthropic_client.messages.create.side_effect = [
-            mock_round1_response,
-            mock_final_response,
+        tool_message = SimpleNamespace(content=[mock_tool_block])
+        final_message = SimpleNamespace(content=[text_block("Final answer")])
+
+        mock_anthropic_client.messages.stream.side_effect = [
+            self._mock_stream(
+                [Mock(type="content_block_stop", content_block=mock_tool_block)],
+                tool_message,
+            ),
+            self._mock_stream([text_block("Final answer")], final_message),
         ]
 
-        # Tool manager that raises exception
         tool_manager = Mock()
-        tool_manager.execute_tool.side_effect = Exception("Tool execution failed")
-
-        tools = [{"name": "failing_tool", "description": "Tool that fails"}]
+        tool_manager.run_tool.return_value = ToolOutput(
+            "Tool execution result", ["Python Course - Lesson 1"], ["http://l1"]
+        )
+        tools = [{"name": "search_course_content"}]
 
-        result = ai_generator_with_mock.generate_response(
-            "Query that triggers tool failure", tools=tools, tool_manager=tool_manager
+        stream = ai_generator_with_mock.generate_response_stream(
+            "Search for Python content", tools=tools, tool_manager=tool_manager
+        )
+        chunks = []
+        while True:
+            try:
+                chunks.append(next(stream))
+            except StopIteration as stop:
+                answer = stop.value
+                break
+
+        assert chunks == ["Final answer"]
+        assert answer.text == "Final answer"
+        assert answer.sources == ["Python Course - Lesson 1"]
+        assert answer.source_links == ["http://l1"]
+        tool_manager.run_tool.assert_called_once_with(
+            "search_course_content", query="Python basics"
         )
+        second_call = mock_anthropic_client.messages.stream.call_args_list[1]
+        tool_result = second_call[1]["messages"][2]["content"][0]
+        assert tool_result["tool_use_id"] == "tool_use_123"
+        assert tool_result["content"] == "Tool execution result"
 
-        # Should get final response despite tool failure
-        assert result == "Response despite tool failure"
+    def test_stream_drops_preamble_before_tool_call(
+        self, ai_generator_with_mock, mock_anthropic_client
+    ):
+        """Test that only the final round's text is streamed, as in generate_response"""
+        mock_tool_block = tool_block("search_course_content", {"query": "q"}, "tool_1")
+        preamble = text_block("Let me search for that.")
+
+        mock_anthropic_client.messages.stream.side_effect = [
+            self._mock_stream(
+                [
+                    preamble,
+                    Mock(type="content_block_stop", content_block=mock_tool_block),
+                ],
+                SimpleNamespace(content=[preamble, mock_tool_block]),
+            ),
+            self._mock_stream(
+                [text_block("Final "), text_block("answer")],
+                SimpleNamespace(content=[text_block("Final answer")]),
+            ),
+        ]
 
-        # Verify two API calls were made
-        assert mock_anthropic_client.messages.create.call_count == 2
+        tool_manager = Mock()
+        tool_manager.run_tool.return_value = ToolOutput("Tool execution result")
 
-        # Verify tool was attempted
-        tool_manager.execute_tool.assert_called_once()
+        chunks = list(
+            ai_generator_with_mock.generate_response_stream(
+                "Search", tools=[{"name": "x"}], tool_manager=tool_manager
+            )
+        )
 
+        assert chunks == ["Final ", "answer"]
 
-class TestAIGeneratorErrorHandling:
-    """Test error handling in AI Generator"""
+    def test_stream_api_error(self, ai_generator_with_mock, mock_anthropic_client):
+        """Test that API errors are yielded as a user-friendly message"""
+        mock_anthropic_client.messages.stream.side_effect = Exception("API Error")
 
-    def test_anthropic_api_error(self, ai_generator_with_mock, mock_anthropic_client):
-        """Test handling of Anthropic API errors"""
-        # Setup mock to raise an exception
-        mock_anthropic_client.messages.create.side_effect = Exception("API Error")
+        chunks = list(ai_generator_with_mock.generate_response_stream("Test query"))
 
-        result = ai_generator_with_mock.generate_response("Test query")
+        assert len(chunks) == 1
+        assert "API Error" in chunks[0]
 
-        # Should return user-friendly error message instead of raising exception
-        assert "I encountered an issue while processing your request" in result
-        assert "API Error" in result
 
-    def test_tool_execution_error(self, ai_generator_with_mock, mock_anthropic_client):
-        """Test handling of tool execution errors"""
-        # Setup mock tool use response
-        mock_tool_block = Mock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.name = "failing_tool"
-        mock_tool_block.input = {"param": "value"}
-        mock_tool_block.id = "tool_123"
+class TestAsyncAIGenerator:
+    """Test the async AI generator"""
 
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_tool_block]
+    @pytest.fixture
+    def async_generator(self, test_config):
+        """AsyncAIGenerator with a mocked async client"""
+        generator = AsyncAIGenerator(
+            test_config.ANTHROPIC_API_KEY, test_config.ANTHROPIC_MODEL
+        )
+        generator.client = Mock()
+        generator.client.messages.create = AsyncMock()
+        return generator
+
+    def test_sibling_of_sync_generator(self):
+        """Test that the async generator inherits no sync round API"""
+        assert not issubclass(AsyncAIGenerator, AIGenerator)
+        assert not hasattr(AsyncAIGenerator, "generate_response_stream")
+        assert not hasattr(AsyncAIGenerator, "_stream_round")
+
+    async def test_generate_response_without_tools(self, async_generator):
+        """Test that a direct answer is awaited and returned"""
+        mock_response = SimpleNamespace(content=[text_block("Async answer")])
+        async_generator.client.messages.create.return_value = mock_response
+
+        result = await async_generator.generate_response("What is Python?")
+
+        assert result == "Async answer"
+        async_generator.client.messages.create.assert_awaited_once()
+
+    async def test_tool_calls_gathered(self, async_generator):
+        """Test that all tool calls of a round are awaited, in tool_use order"""
+        blocks = []
+        for i in range(2):
+            block = tool_block("search_course_content", {"query": f"q{i}"}, f"tool_{i}")
+            blocks.append(block)
+
+        tool_response = SimpleNamespace(content=blocks)
+        final_response = SimpleNamespace(content=[text_block("Combined answer")])
+        async_generator.client.messages.create.side_effect = [
+            tool_response,
+            final_response,
+        ]
 
-        # Setup mock tool manager to raise exception
         tool_manager = Mock()
-        tool_manager.execute_tool.side_effect = Exception("Tool execution failed")
+        tool_manager.arun_tool = AsyncMock(
+            side_effect=lambda name, query: ToolOutput(f"result {query}")
+        )
 
-        mock_anthropic_client.messages.create.side_effect = [mock_initial_response]
+        result = await async_generator.generate_response(
+            "Compare", tools=[{"name": "x"}], tool_manager=tool_manager
+        )
 
-        base_params = {
-            "messages": [{"role": "user", "content": "Test query"}],
-            "system": "Test system prompt",
-        }
+        assert result == "Combined answer"
+        assert tool_manager.arun_tool.await_count == 2
+        second_call = async_generator.client.messages.create.call_args_list[1]
+        tool_results = second_call[1]["messages"][2]["content"]
+        assert [r["content"] for r in tool_results] == ["result q0", "result q1"]
 
-        # The tool execution error should propagate
-        with pytest.raises(Exception):
-            ai_generator_with_mock._handle_tool_execution(
-                mock_initial_response, base_params, tool_manager
+    async def test_tool_cancellation_propagates(self, async_generator):
+        """Test that a cancelled tool call is re-raised, not sent as a result"""
+        async_generator.client.messages.create.return_value = SimpleNamespace(
+            content=[tool_block("search_course_content", {"query": "q"}, "tool_1")]
+        )
+
+        tool_manager = Mock()
+        tool_manager.arun_tool = AsyncMock(side_effect=asyncio.CancelledError())
+
+        with pytest.raises(asyncio.CancelledError):
+            await async_generator.generate_response(
+                "Search", tools=[{"name": "x"}], tool_manager=tool_manager
             )
 
-    def test_malformed_tool_response(
-        self, ai_generator_with_mock, mock_anthropic_client
-    ):
-        """Test handling of malformed tool responses"""
-        # Setup mock response with non-tool content
-        mock_text_block = Mock()
-        mock_text_block.type = "text"
-        mock_text_block.text = "Some text"
+        async_generator.client.messages.create.assert_awaited_once()
+
+    async def test_concurrent_answers_keep_own_sources(self, async_generator):
+        """Test that concurrent queries sharing a tool manager get their own sources"""
 
-        mock_initial_response = Mock()
-        mock_initial_response.content = [mock_text_block]  # No tool_use blocks
+        async def create(**params):
+            query = params["messages"][0]["content"]
+            if len(params["messages"]) == 1:
+                return SimpleNamespace(
+                    content=[tool_block("search", {"query": query}, f"id_{query}")]
+                )
+            return SimpleNamespace(content=[text_block(f"answer {query}")])
 
+        async def arun_tool(name, query):
+            # Let the other query run its tool before this one returns
+            await asyncio.sleep(0)
+            return ToolOutput(query, [f"source {query}"], [f"http://{query}"])
+
+        async_generator.client.messages.create.side_effect = create
         tool_manager = Mock()
+        tool_manager.arun_tool = AsyncMock(side_effect=arun_tool)
+
+        first, second = await asyncio.gather(
+            *[
+                async_generator.generate_answer(
+                    query, tools=[{"name": "search"}], tool_manager=tool_manager
+                )
+                for query in ("a", "b")
+            ]
+        )
+
+        assert (first.text, first.sources) == ("answer a", ["source a"])
+        assert (second.text, second.source_links) == ("answer b", ["http://b"])
 
-        mock_final_response = Mock()
-        mock_final_response.content = [Mock(text="Final response")]
-        mock_anthropic_client.messages.create.return_value = mock_final_response
+    async def test_api_error(self, async_generator):
+        """Test that API errors become a user-friendly message"""
+        async_generator.client.messages.create.side_effect = Exception("API Error")
+
+        result = await async_generator.generate_response("Test query")
+
+        assert "API Error" in result
 
-        base_params = {
-            "messages": [{"role": "user", "content": "Test query"}],
-            "system": "Test system prompt",
-        }
+    async def test_tool_failure_not_cached(self, async_generator):
+        """Test that an answer following a failed tool is never cached"""
+        async_generator.response_cache = Mock()
+        async_generator.response_cache.lookup.return_value = (None, [0.1, 0.2])
+        async_generator.client.messages.create.side_effect = [
+            tool_use_response("search_course_content", {"query": "q"}, "tool_1"),
+            text_response("Partial answer"),
+        ]
+        tool_manager = Mock()
+        tool_manager.arun_tool = AsyncMock(side_effect=Exception("Search failed"))
 
-        # Should handle gracefully with no tool executions
-        result = ai_generator_with_mock._handle_tool_execution(
-            mock_initial_response, base_params, tool_manager
+        result = await async_generator.generate_response(
+            "Search", tools=[SEARCH_TOOL], tool_manager=tool_manager
         )
 
-        # No tools should be executed
-        tool_manager.execute_tool.assert_not_called()
+        assert result == "Partial answer"
+        async_generator.response_cache.store.assert_not_called()
 
 
 class TestAIGeneratorIntegration:
     """Integration tests for AI Generator"""
 
+    @pytest.mark.slow
     @pytest.mark.integration
-    def test_real_anthropic_api_call(self, test_config):
+    @pytest.mark.xdist_group("integration")
+    @pytest.mark.skipif(
+        not config.ANTHROPIC_API_KEY,
+        reason="No Anthropic API key configured for integration test",
+    )
+    def test_real_anthropic_api_call(self):
         """Test with real Anthropic API (requires valid API key)"""
-        if (
-            not test_config.ANTHROPIC_API_KEY
-            or test_config.ANTHROPIC_API_KEY == "test-key"
-        ):
-            pytest.skip("No valid Anthropic API key for integration test")
-
-        generator = AIGenerator(
-            test_config.ANTHROPIC_API_KEY, test_config.ANTHROPIC_MODEL
-        )
+        generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL)
 
         try:
             result = generator.generate_response("What is 2+2?")
@@ -3,26 +3,87 @@ Test module for FastAPI endpoints.
 
 Tests all API endpoints for proper request/response handling:
 - POST /api/query - Query documents with RAG system
+- POST /api/query/stream - Stream a query response as NDJSON events
 - GET /api/courses - Get course statistics
 - POST /api/session/clear - Clear session conversation history
 
 Uses the enhanced fixtures from conftest.py that avoid static file mounting issues.
 """
 
-import os
-import sys
-from unittest.mock import Mock, patch
+import asyncio
+import functools
+import json
 
+import anyio
+import httpx
+import orjson
 import pytest
-from fastapi.testclient import TestClient
+from jsonschema import Draft202012Validator
+from tests.rag_defaults import DEFAULT_ANSWER, DEFAULT_LINKS, DEFAULT_SOURCES
+
+# Keep the endpoint tests on one xdist worker so it builds the app only once
+pytestmark = pytest.mark.xdist_group("api")
+
+# Request bodies shared by tests that do not depend on the exact query text
+_QUERY_PAYLOAD = {"query": "What is Python?"}
+_EMPTY_PAYLOAD: dict = {}
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@functools.lru_cache(maxsize=None)
+def _query_request(query):
+    """Pre-built /api/query request, sent with client.send and reused per query"""
+    return httpx.Request(
+        "POST",
+        "http://test/api/query",
+        content=orjson.dumps({"query": query}),
+        headers=_JSON_HEADERS,
+    )
+
+
+# Requests sent in loops are built once at import
+_CONCURRENT_REQUESTS = [_query_request(f"Query {i}") for i in range(32)]
+
+
+def _expect_status(response, status_code):
+    """Assert the status code and return the response with its parsed body"""
+    assert response.status_code == status_code
+    return response, response.json()
+
+
+def ok(response):
+    """Assert a 200 response and parse its JSON body once"""
+    return _expect_status(response, 200)
+
+
+def unprocessable(response):
+    """Assert a 422 validation error and parse its JSON body once"""
+    return _expect_status(response, 422)
+
+
+def server_error(response):
+    """Assert a 500 error and parse its JSON body once"""
+    return _expect_status(response, 500)
+
+
+@pytest.fixture
+def rag_error(mock_rag_system, request):
+    """Make one mock RAG method raise; parametrized with (dotted path, message)"""
+    target, message = request.param
+    method = mock_rag_system
+    for attr in target.split("."):
+        method = getattr(method, attr)
+    method.side_effect = Exception(message)
+    return message
 
 
 class TestQueryEndpoint:
     """Test the /api/query endpoint"""
 
-    def test_query_with_session_id(self, client, mock_rag_system):
+    async def test_query_with_session_id(self, client, mock_rag_system):
         """Test query with existing session ID"""
-        response = client.post(
+        response = await client.post(
             "/api/query",
             json={
                 "query": "What is machine learning?",
@@ -30,140 +91,125 @@ class TestQueryEndpoint:
             },
         )
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["answer"] == "This is a test response"
-        assert data["sources"] == ["Source 1", "Source 2"]
-        assert data["source_links"] == [
-            "http://example.com/lesson/1",
-            "http://example.com/lesson/2",
-        ]
+        _, data = ok(response)
+        assert data["answer"] == DEFAULT_ANSWER
+        assert data["sources"] == list(DEFAULT_SOURCES)
+        assert data["source_links"] == list(DEFAULT_LINKS)
         assert data["session_id"] == "test-session-456"
 
         # Verify RAG system was called with provided session
-        mock_rag_system.query.assert_called_once_with(
+        mock_rag_system.aquery.assert_called_once_with(
             "What is machine learning?", "test-session-456"
         )
 
-    def test_query_without_session_id(self, client, mock_rag_system):
+    async def test_query_without_session_id(self, client, mock_rag_system):
         """Test query without session ID - should create new session"""
-        response = client.post(
+        response = await client.post(
             "/api/query", json={"query": "What is artificial intelligence?"}
         )
 
-        assert response.status_code == 200
-        data = response.json()
-        assert data["answer"] == "This is a test response"
-        assert data["sources"] == ["Source 1", "Source 2"]
-        assert data["source_links"] == [
-            "http://example.com/lesson/1",
-            "http://example.com/lesson/2",
-        ]
+        _, data = ok(response)
+        assert data["answer"] == DEFAULT_ANSWER
+        assert data["sources"] == list(DEFAULT_SOURCES)
+        assert data["source_links"] == list(DEFAULT_LINKS)
         assert data["session_id"] == "test-session-123"  # From mock
 
         # Verify new session was created
         mock_rag_system.session_manager.create_session.assert_called_once()
-        mock_rag_system.query.assert_called_once_with(
+        mock_rag_system.aquery.assert_called_once_with(
             "What is artificial intelligence?", "test-session-123"
         )
 
-    def test_query_missing_query_parameter(self, client):
-        """Test query request with missing query parameter"""
-        response = client.post("/api/query", json={})
-
-        assert response.status_code == 422  # Validation error
-        data = response.json()
-        assert "detail" in data
-
-    def test_query_empty_query_string(self, client, mock_rag_system):
-        """Test query with empty query string"""
-        response = client.post("/api/query", json={"query": ""})
+    @pytest.mark.parametrize(
+        "query",
+        [
+            pytest.param("", id="empty"),
+            pytest.param("test " * 1000, id="long"),
+            pytest.param("What about @#$%^&*()_+-=[]{}|;:,.<>?", id="special"),
+            pytest.param(
+                "What is 机器学习? Explain ñoñería and émotions 🤖", id="unicode"
+            ),
+        ],
+    )
+    async def test_query_variants(self, client, mock_rag_system, query):
+        """Test that unusual query strings are passed through unchanged"""
+        response = await client.send(_query_request(query))
 
-        assert response.status_code == 200  # Should still process empty query
-        mock_rag_system.query.assert_called_once()
-
-    def test_query_with_rag_system_error(self, client, mock_rag_system):
-        """Test query when RAG system raises an exception"""
-        # Make the mock RAG system throw an exception
-        mock_rag_system.query.side_effect = Exception("RAG system error")
+        assert response.status_code == 200
+        mock_rag_system.aquery.assert_called_once_with(query, "test-session-123")
 
-        response = client.post("/api/query", json={"query": "What is deep learning?"})
 
-        assert response.status_code == 500
-        data = response.json()
-        assert "RAG system error" in data["detail"]
+class TestQueryStreamEndpoint:
+    """Test the /api/query/stream endpoint"""
 
-    def test_query_invalid_json(self, client):
-        """Test query with malformed JSON"""
-        response = client.post(
-            "/api/query",
-            data="invalid json",
-            headers={"Content-Type": "application/json"},
+    async def test_query_stream_events(self, client, mock_rag_system):
+        """Test that the stream emits session, text and sources events"""
+        response = await client.post(
+            "/api/query/stream", json={"query": "What is MCP?"}
         )
 
-        assert response.status_code == 422
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert events[0] == {"type": "session", "session_id": "test-session-123"}
+        assert events[1] == {"type": "text", "text": DEFAULT_ANSWER}
+        assert events[2] == {
+            "type": "sources",
+            "sources": list(DEFAULT_SOURCES),
+            "source_links": list(DEFAULT_LINKS),
+        }
+        mock_rag_system.query_stream.assert_called_once_with(
+            "What is MCP?", "test-session-123"
+        )
 
-    def test_query_very_long_query(self, client, mock_rag_system):
-        """Test query with very long query string"""
-        long_query = "test " * 1000  # Very long query
+    async def test_query_stream_error_event(self, client, mock_rag_system):
+        """Test that errors during streaming become an error event"""
+        mock_rag_system.query_stream.side_effect = Exception("Stream error")
 
-        response = client.post("/api/query", json={"query": long_query})
+        response = await client.post(
+            "/api/query/stream", json={"query": "Test", "session_id": "s1"}
+        )
 
-        assert response.status_code == 200
-        mock_rag_system.query.assert_called_once()
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert events[-1] == {"type": "error", "detail": "Stream error"}
 
-    def test_query_special_characters(self, client, mock_rag_system):
-        """Test query with special characters"""
-        special_query = "What about @#$%^&*()_+-=[]{}|;:,.<>?"
+    async def test_query_stream_session_error_event(self, client, mock_rag_system):
+        """Test that a failure creating the session becomes an error event"""
+        create_session = mock_rag_system.session_manager.create_session
+        create_session.side_effect = Exception("Session store down")
 
-        response = client.post("/api/query", json={"query": special_query})
+        response = await client.post("/api/query/stream", json={"query": "Test"})
 
         assert response.status_code == 200
-        mock_rag_system.query.assert_called_once_with(special_query, "test-session-123")
+        events = [json.loads(line) for line in response.text.splitlines()]
+        assert events == [{"type": "error", "detail": "Session store down"}]
+        mock_rag_system.query_stream.assert_not_called()
 
 
 class TestCoursesEndpoint:
     """Test the /api/courses endpoint"""
 
-    def test_get_course_stats_success(self, client, mock_rag_system):
+    async def test_get_course_stats_success(self, client, mock_rag_system):
         """Test successful retrieval of course statistics"""
-        response = client.get("/api/courses")
+        response = await client.get("/api/courses")
 
-        assert response.status_code == 200
-        data = response.json()
+        _, data = ok(response)
         assert data["total_courses"] == 2
         assert data["course_titles"] == ["Test Course 1", "Test Course 2"]
 
         # Verify analytics method was called
         mock_rag_system.get_course_analytics.assert_called_once()
 
-    def test_get_course_stats_with_analytics_error(self, client, mock_rag_system):
-        """Test course stats when analytics method raises an exception"""
-        mock_rag_system.get_course_analytics.side_effect = Exception("Analytics error")
-
-        response = client.get("/api/courses")
-
-        assert response.status_code == 500
-        data = response.json()
-        assert "Analytics error" in data["detail"]
-
-    def test_get_course_stats_method_not_allowed(self, client):
-        """Test that POST is not allowed for courses endpoint"""
-        response = client.post("/api/courses", json={})
-
-        assert response.status_code == 405  # Method not allowed
-
-    def test_get_course_stats_empty_result(self, client, mock_rag_system):
+    async def test_get_course_stats_empty_result(self, client, mock_rag_system):
         """Test course stats with empty analytics"""
         mock_rag_system.get_course_analytics.return_value = {
             "total_courses": 0,
             "course_titles": [],
         }
 
-        response = client.get("/api/courses")
+        response = await client.get("/api/courses")
 
-        assert response.status_code == 200
-        data = response.json()
+        _, data = ok(response)
         assert data["total_courses"] == 0
         assert data["course_titles"] == []
 
@@ -171,14 +217,13 @@ class TestCoursesEndpoint:
 class TestClearSessionEndpoint:
     """Test the /api/session/clear endpoint"""
 
-    def test_clear_session_success(self, client, mock_rag_system):
+    async def test_clear_session_success(self, client, mock_rag_system):
         """Test successful session clearing"""
-        response = client.post(
+        response = await client.post(
             "/api/session/clear", json={"session_id": "test-session-789"}
         )
 
-        assert response.status_code == 200
-        data = response.json()
+        _, data = ok(response)
         assert data["status"] == "success"
         assert "test-session-789" in data["message"]
 
@@ -187,38 +232,10 @@ class TestClearSessionEndpoint:
             "test-session-789"
         )
 
-    def test_clear_session_missing_session_id(self, client):
-        """Test clear session with missing session_id parameter"""
-        response = client.post("/api/session/clear", json={})
-
-        assert response.status_code == 422  # Validation error
-        data = response.json()
-        assert "detail" in data
-
-    def test_clear_session_with_session_manager_error(self, client, mock_rag_system):
-        """Test clear session when session manager raises an exception"""
-        mock_rag_system.session_manager.clear_session.side_effect = Exception(
-            "Session error"
-        )
-
-        response = client.post(
-            "/api/session/clear", json={"session_id": "test-session-error"}
-        )
-
-        assert response.status_code == 500
-        data = response.json()
-        assert "Session error" in data["detail"]
-
-    def test_clear_session_method_not_allowed(self, client):
-        """Test that GET is not allowed for clear session endpoint"""
-        response = client.get("/api/session/clear")
-
-        assert response.status_code == 405  # Method not allowed
-
-    def test_clear_session_nonexistent_session(self, client, mock_rag_system):
+    async def test_clear_session_nonexistent_session(self, client, mock_rag_system):
         """Test clearing a nonexistent session"""
         # Should still succeed even if session doesn't exist
-        response = client.post(
+        response = await client.post(
             "/api/session/clear", json={"session_id": "nonexistent-session"}
         )
 
@@ -231,141 +248,162 @@ class TestClearSessionEndpoint:
 class TestCORSAndMiddleware:
     """Test CORS and middleware functionality"""
 
-    def test_cors_headers_present(self, client):
-        """Test that CORS headers are properly set"""
-        response = client.options("/api/query")
-
-        assert response.status_code == 200
-        # Note: TestClient may not preserve all headers, but we test what we can
-
-    def test_cors_preflight_request(self, client):
-        """Test CORS preflight request handling"""
-        response = client.options(
+    @pytest.mark.parametrize(
+        "origin,method",
+        [
+            pytest.param("http://localhost:3000", "POST", id="localhost-post"),
+            pytest.param("http://example.com", "GET", id="remote-get"),
+        ],
+    )
+    async def test_cors_preflight_request(self, cors_client, origin, method):
+        """Test that preflight requests are allowed for the requesting origin"""
+        response = await cors_client.options(
             "/api/query",
             headers={
-                "Origin": "http://localhost:3000",
-                "Access-Control-Request-Method": "POST",
+                "Origin": origin,
+                "Access-Control-Request-Method": method,
                 "Access-Control-Request-Headers": "Content-Type",
             },
         )
 
         assert response.status_code == 200
+        assert response.headers.get("access-control-allow-origin") == origin
+        assert method in response.headers["access-control-allow-methods"]
+
+
+def _object_validator(properties):
+    """Validator requiring every listed property, built once per schema"""
+    return Draft202012Validator(
+        {"type": "object", "required": list(properties), "properties": properties}
+    )
+
+
+_QUERY_RESPONSE_VALIDATOR = _object_validator(
+    {
+        "answer": {"type": "string"},
+        "sources": {"type": "array", "items": {"type": "string"}},
+        "source_links": {"type": "array", "items": {"type": ["string", "null"]}},
+        "session_id": {"type": "string"},
+    }
+)
+_COURSES_RESPONSE_VALIDATOR = _object_validator(
+    {
+        "total_courses": {"type": "integer", "minimum": 0},
+        "course_titles": {"type": "array", "items": {"type": "string"}},
+    }
+)
+_CLEAR_SESSION_RESPONSE_VALIDATOR = _object_validator(
+    {"status": {"const": "success"}, "message": {"type": "string"}}
+)
 
 
 class TestAPIResponseFormats:
     """Test API response format consistency"""
 
-    def test_query_response_format(self, client, mock_rag_system):
+    async def test_query_response_format(self, client, mock_rag_system):
         """Test that query response has correct format and types"""
-        response = client.post("/api/query", json={"query": "test query"})
+        response = await client.post("/api/query", json=_QUERY_PAYLOAD)
 
-        assert response.status_code == 200
-        data = response.json()
-
-        # Check required fields exist
-        required_fields = ["answer", "sources", "source_links", "session_id"]
-        for field in required_fields:
-            assert field in data
-
-        # Check field types
-        assert isinstance(data["answer"], str)
-        assert isinstance(data["sources"], list)
-        assert isinstance(data["source_links"], list)
-        assert isinstance(data["session_id"], str)
+        _, data = ok(response)
+        _QUERY_RESPONSE_VALIDATOR.validate(data)
 
         # Check sources and source_links have same length
         assert len(data["sources"]) == len(data["source_links"])
 
-        # Verify all sources are strings
-        for source in data["sources"]:
-            assert isinstance(source, str)
-
-        # Verify all source_links are strings or None
-        for link in data["source_links"]:
-            assert link is None or isinstance(link, str)
-
-    def test_courses_response_format(self, client, mock_rag_system):
+    async def test_courses_response_format(self, client, mock_rag_system):
         """Test that courses response has correct format and types"""
-        response = client.get("/api/courses")
-
-        assert response.status_code == 200
-        data = response.json()
-
-        # Check required fields exist
-        assert "total_courses" in data
-        assert "course_titles" in data
-
-        # Check field types
-        assert isinstance(data["total_courses"], int)
-        assert isinstance(data["course_titles"], list)
-        assert data["total_courses"] >= 0
+        response = await client.get("/api/courses")
 
-        # Verify all course titles are strings
-        for title in data["course_titles"]:
-            assert isinstance(title, str)
+        _, data = ok(response)
+        _COURSES_RESPONSE_VALIDATOR.validate(data)
 
         # Verify total_courses matches length of course_titles
         assert data["total_courses"] == len(data["course_titles"])
 
-    def test_clear_session_response_format(self, client, mock_rag_system):
+    async def test_clear_session_response_format(self, client, mock_rag_system):
         """Test that clear session response has correct format"""
-        response = client.post(
+        response = await client.post(
             "/api/session/clear", json={"session_id": "test-session"}
         )
 
-        assert response.status_code == 200
-        data = response.json()
-
-        # Check required fields exist
-        assert "status" in data
-        assert "message" in data
-
-        # Check field types and values
-        assert isinstance(data["status"], str)
-        assert isinstance(data["message"], str)
-        assert data["status"] == "success"
+        _, data = ok(response)
+        _CLEAR_SESSION_RESPONSE_VALIDATOR.validate(data)
 
 
 class TestErrorHandling:
     """Test comprehensive error handling scenarios"""
 
-    def test_internal_server_error_format(self, client, mock_rag_system):
-        """Test that 500 errors have consistent format"""
-        mock_rag_system.query.side_effect = Exception("Test error")
-
-        response = client.post("/api/query", json={"query": "test"})
-
-        assert response.status_code == 500
-        data = response.json()
-        assert "detail" in data
-        assert "Test error" in data["detail"]
+    @pytest.mark.parametrize(
+        "rag_error,method,url,body",
+        [
+            pytest.param(
+                ("aquery", "RAG system error"),
+                "post",
+                "/api/query",
+                _QUERY_PAYLOAD,
+                id="query",
+            ),
+            pytest.param(
+                ("get_course_analytics", "Analytics error"),
+                "get",
+                "/api/courses",
+                None,
+                id="courses",
+            ),
+            pytest.param(
+                ("session_manager.clear_session", "Session error"),
+                "post",
+                "/api/session/clear",
+                {"session_id": "test-session-error"},
+                id="clear_session",
+            ),
+        ],
+        indirect=["rag_error"],
+    )
+    async def test_internal_server_error_format(
+        self, client, rag_error, method, url, body
+    ):
+        """Test that RAG failures surface as 500s carrying the error message"""
+        if body is None:
+            response = await client.request(method, url)
+        else:
+            response = await client.request(method, url, json=body)
+
+        _, data = server_error(response)
         assert isinstance(data["detail"], str)
+        assert rag_error in data["detail"]
 
-    def test_validation_error_format(self, client):
+    async def test_validation_error_format(self, client):
         """Test that 422 validation errors have consistent format"""
-        response = client.post("/api/query", json={"invalid": "field"})
+        response = await client.post("/api/query", json={"invalid": "field"})
 
-        assert response.status_code == 422
-        data = response.json()
+        _, data = unprocessable(response)
         assert "detail" in data
         assert isinstance(data["detail"], list)  # FastAPI validation error format
 
-    def test_404_on_nonexistent_endpoint(self, client):
-        """Test 404 error on nonexistent endpoint"""
-        response = client.get("/api/nonexistent")
+    @pytest.mark.parametrize(
+        "method,url,expected",
+        [
+            pytest.param("POST", "/api/courses", 405, id="courses-post"),
+            pytest.param("GET", "/api/session/clear", 405, id="clear-session-get"),
+            pytest.param("GET", "/api/nonexistent", 404, id="nonexistent"),
+        ],
+    )
+    async def test_method_routing(self, client, method, url, expected):
+        """Test 404/405 errors for unknown endpoints and unsupported methods"""
+        response = await client.request(method, url)
 
-        assert response.status_code == 404
-        data = response.json()
-        assert "detail" in data
+        assert response.status_code == expected
+        assert "detail" in response.json()
 
 
 class TestIntegrationScenarios:
     """Test realistic integration scenarios"""
 
-    def test_complete_query_workflow(self, client, mock_rag_system):
+    async def test_complete_query_workflow(self, client, mock_rag_system):
         """Test a complete query workflow from start to finish"""
         # Step 1: Query without session (should create new session)
-        response1 = client.post(
+        response1 = await client.post(
             "/api/query", json={"query": "What is machine learning?"}
         )
         assert response1.status_code == 200
@@ -373,7 +411,7 @@ class TestIntegrationScenarios:
         assert session_id == "test-session-123"
 
         # Step 2: Query with the same session
-        response2 = client.post(
+        response2 = await client.post(
             "/api/query",
             json={
                 "query": "Tell me more about neural networks",
@@ -384,24 +422,24 @@ class TestIntegrationScenarios:
         assert response2.json()["session_id"] == session_id
 
         # Step 3: Clear the session
-        response3 = client.post("/api/session/clear", json={"session_id": session_id})
+        response3 = await client.post(
+            "/api/session/clear", json={"session_id": session_id}
+        )
         assert response3.status_code == 200
 
         # Verify session manager was called correctly
         mock_rag_system.session_manager.clear_session.assert_called_with(session_id)
 
-    def test_course_stats_and_query_consistency(self, client, mock_rag_system):
+    async def test_course_stats_and_query_consistency(self, client, mock_rag_system):
         """Test that course stats are consistent with available courses for querying"""
         # Get course statistics
-        stats_response = client.get("/api/courses")
-        assert stats_response.status_code == 200
-
-        stats_data = stats_response.json()
+        stats_response = await client.get("/api/courses")
+        _, stats_data = ok(stats_response)
         assert stats_data["total_courses"] > 0
         assert len(stats_data["course_titles"]) == stats_data["total_courses"]
 
         # Verify we can query about the courses
-        query_response = client.post(
+        query_response = await client.post(
             "/api/query",
             json={"query": f"Tell me about {stats_data['course_titles'][0]}"},
         )
@@ -409,55 +447,70 @@ class TestIntegrationScenarios:
 
         # Both endpoints should use the same underlying system
         assert mock_rag_system.get_course_analytics.call_count == 1
-        assert mock_rag_system.query.call_count == 1
-
-    def test_multiple_sessions_isolation(self, client, mock_rag_system):
-        """Test that multiple sessions are properly isolated"""
-        # Create first session
-        response1 = client.post("/api/query", json={"query": "First session query"})
-        session1 = response1.json()["session_id"]
-
-        # Reset mock to clear previous calls
-        mock_rag_system.reset_mock()
-        mock_rag_system.session_manager.create_session.return_value = "test-session-456"
-        mock_rag_system.query.return_value = (
-            "This is a test response",
-            ["Source 1", "Source 2"],
-            ["http://example.com/lesson/1", "http://example.com/lesson/2"],
-        )
+        assert mock_rag_system.aquery.call_count == 1
 
-        # Create second session
-        response2 = client.post("/api/query", json={"query": "Second session query"})
-        session2 = response2.json()["session_id"]
+    async def test_multiple_sessions_isolation(self, client, mock_rag_system):
+        """Test that concurrent first queries each get their own session"""
+        create_session = mock_rag_system.session_manager.create_session
+        create_session.side_effect = ["test-session-123", "test-session-456"]
+        results = {}
 
-        # Sessions should be different
-        assert session1 != session2
+        async def post_query(query):
+            response = await client.post("/api/query", json={"query": query})
+            _, results[query] = ok(response)
 
-        # Both should work independently
-        assert response1.status_code == 200
-        assert response2.status_code == 200
+        # Both requests are in flight at once
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(post_query, "First session query")
+            tg.start_soon(post_query, "Second session query")
+
+        # Sessions should be different, one per request
+        session_ids = {data["session_id"] for data in results.values()}
+        assert session_ids == {"test-session-123", "test-session-456"}
+        assert create_session.call_count == 2
 
 
 class TestRequestValidationEdgeCases:
     """Test edge cases in request validation"""
 
-    def test_query_with_null_values(self, client):
-        """Test query with null values in JSON"""
-        response = client.post("/api/query", json={"query": None})
-
-        assert response.status_code == 422  # Validation error
+    @pytest.mark.parametrize(
+        "endpoint,json_body,raw",
+        [
+            pytest.param("/api/query", _EMPTY_PAYLOAD, None, id="missing_query"),
+            pytest.param("/api/query", {"query": None}, None, id="null_query"),
+            pytest.param("/api/query", None, "invalid json", id="invalid_json"),
+            pytest.param(
+                "/api/session/clear", _EMPTY_PAYLOAD, None, id="missing_session"
+            ),
+        ],
+    )
+    async def test_invalid_request_body(self, client, endpoint, json_body, raw):
+        """Test that missing, null or malformed fields are rejected with 422"""
+        if raw is None:
+            response = await client.post(endpoint, json=json_body)
+        else:
+            response = await client.post(
+                endpoint,
+                content=raw,
+                headers=_JSON_HEADERS,
+            )
+
+        _, data = unprocessable(response)
+        assert "detail" in data
 
-    def test_clear_session_with_empty_string_session_id(self, client, mock_rag_system):
+    async def test_clear_session_with_empty_string_session_id(
+        self, client, mock_rag_system
+    ):
         """Test clear session with empty string session ID"""
-        response = client.post("/api/session/clear", json={"session_id": ""})
+        response = await client.post("/api/session/clear", json={"session_id": ""})
 
         # Should still succeed (empty string is valid)
         assert response.status_code == 200
         mock_rag_system.session_manager.clear_session.assert_called_once_with("")
 
-    def test_query_with_extra_fields(self, client, mock_rag_system):
+    async def test_query_with_extra_fields(self, client, mock_rag_system):
         """Test query with additional unexpected fields"""
-        response = client.post(
+        response = await client.post(
             "/api/query",
             json={
                 "query": "Test query",
@@ -468,54 +521,45 @@ class TestRequestValidationEdgeCases:
 
         # Should succeed and ignore extra fields
         assert response.status_code == 200
-        mock_rag_system.query.assert_called_once()
+        mock_rag_system.aquery.assert_called_once_with("Test query", "test-session-123")
+        data = response.json()
+        assert "extra_field" not in data
+        assert "another_field" not in data
 
 
 class TestPerformanceAndRobustness:
     """Test performance and robustness scenarios"""
 
-    def test_concurrent_requests_simulation(self, client, mock_rag_system):
-        """Test handling of multiple rapid requests"""
-        responses = []
-
-        # Simulate concurrent requests
-        for i in range(5):
-            response = client.post("/api/query", json={"query": f"Query {i}"})
-            responses.append(response)
+    async def test_concurrent_requests_simulation(self, client, mock_rag_system):
+        """Test handling of many requests in flight at once"""
+        # All requests are dispatched concurrently on the event loop
+        responses = await asyncio.gather(
+            *[client.send(request) for request in _CONCURRENT_REQUESTS]
+        )
 
         # All should succeed
         for response in responses:
             assert response.status_code == 200
 
         # RAG system should have been called for each request
-        assert mock_rag_system.query.call_count == 5
-
-    def test_unicode_query_handling(self, client, mock_rag_system):
-        """Test handling of unicode characters in queries"""
-        unicode_query = "What is 机器学习? Explain ñoñería and émotions 🤖"
-
-        response = client.post("/api/query", json={"query": unicode_query})
+        assert mock_rag_system.aquery.call_count == len(_CONCURRENT_REQUESTS)
 
-        assert response.status_code == 200
-        mock_rag_system.query.assert_called_once_with(unicode_query, "test-session-123")
-
-    def test_error_recovery(self, client, mock_rag_system):
+    async def test_error_recovery(self, client, mock_rag_system, make_rag_response):
         """Test system recovery after errors"""
         # First request fails
-        mock_rag_system.query.side_effect = Exception("Temporary error")
+        mock_rag_system.aquery.side_effect = Exception("Temporary error")
 
-        response1 = client.post("/api/query", json={"query": "First query"})
+        response1 = await client.post("/api/query", json={"query": "First query"})
         assert response1.status_code == 500
 
         # System recovers for second request
-        mock_rag_system.query.side_effect = None
-        mock_rag_system.query.return_value = (
-            "Recovery response",
-            ["Source"],
-            ["http://example.com/lesson/1"],
+        mock_rag_system.aquery.side_effect = None
+        mock_rag_system.aquery.return_value = make_rag_response(
+            answer="Recovery response",
+            sources=["Source"],
+            links=["http://example.com/lesson/1"],
         )
 
-        response2 = client.post("/api/query", json={"query": "Second query"})
-        assert response2.status_code == 200
-        data = response2.json()
+        response2 = await client.post("/api/query", json={"query": "Second query"})
+        _, data = ok(response2)
         assert data["answer"] == "Recovery response"
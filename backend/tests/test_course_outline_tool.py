@@ -1,7 +1,63 @@
+import re
 from unittest.mock import Mock, patch
 
+import orjson
 import pytest
-from search_tools import CourseOutlineTool
+from search_tools import CourseOutlineTool, _parse_lessons
+
+# Formatted outline lesson lines look like "<number>. <title>"
+_LESSON_LINE = re.compile(r"^\s*\d+\.\s")
+
+
+def _lessons_json(*lessons):
+    """Serialize lessons the way they are stored in catalog metadata"""
+    return orjson.dumps(list(lessons)).decode()
+
+
+def _catalog_result(lessons_json, title="Test Course", **extra):
+    """Build a course_catalog.get() result holding a single course"""
+    metadata = {"title": title, "course_link": "http://example.com/course"}
+    metadata.update(extra, lessons_json=lessons_json)
+    return {"metadatas": [metadata]}
+
+
+# Catalog responses are built once and shared; the tool only reads them
+_META_OK = _catalog_result(
+    _lessons_json(
+        {"lesson_number": 1, "lesson_title": "Introduction"},
+        {"lesson_number": 2, "lesson_title": "Advanced Topics"},
+    )
+)
+_META_NO_LINK = _catalog_result("[]", course_link=None)
+_META_NO_LESSONS = _catalog_result("[]")
+_META_MALFORMED = _catalog_result("invalid json")
+_META_UNSORTED = _catalog_result(
+    _lessons_json(
+        {"lesson_number": 3, "lesson_title": "Third"},
+        {"lesson_number": 1, "lesson_title": "First"},
+        {"lesson_number": 2, "lesson_title": "Second"},
+    )
+)
+_META_MEMO = _catalog_result(
+    _lessons_json({"lesson_number": 1, "lesson_title": "Memo"}), title="Memo Course"
+)
+_META_PRECOMPUTED = _catalog_result(
+    "invalid json",
+    title="Stored Course",
+    formatted_outline="**Stored Course**\nCourse Link: Not available",
+)
+_META_MISSING_DATA = _catalog_result(
+    _lessons_json(
+        {"lesson_number": 1},
+        {"lesson_title": "No Number"},
+        {"lesson_number": 2, "lesson_title": "Complete"},
+    )
+)
+_META_PARTIAL = _catalog_result(
+    _lessons_json({"lesson_number": 1, "lesson_title": "Lesson 1"}),
+    title="Full Course Name",
+)
+_META_EMPTY = {"metadatas": []}
 
 
 class TestCourseOutlineTool:
@@ -18,21 +74,21 @@ class TestCourseOutlineTool:
         assert "course_title" in definition["input_schema"]["properties"]
         assert "course_title" in definition["input_schema"]["required"]
 
+    def test_tool_definition_shared_across_instances(self, mock_vector_store):
+        """Test that the static schema is returned without being rebuilt"""
+        first = CourseOutlineTool(mock_vector_store)
+        second = CourseOutlineTool(mock_vector_store)
+
+        assert first.get_tool_definition() is first.get_tool_definition()
+        assert first.get_tool_definition() is second.get_tool_definition()
+
     def test_execute_successful_outline(self, course_outline_tool, mock_vector_store):
         """Test successful course outline retrieval"""
         # Setup mock course resolution
         mock_vector_store._resolve_course_name.return_value = "Test Course"
 
         # Setup mock course catalog response
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": '[{"lesson_number": 1, "lesson_title": "Introduction"}, {"lesson_number": 2, "lesson_title": "Advanced Topics"}]',
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_OK
 
         result = course_outline_tool.execute("Test")
 
@@ -65,7 +121,7 @@ class TestCourseOutlineTool:
     def test_execute_no_metadata(self, course_outline_tool, mock_vector_store):
         """Test handling when course metadata is not found"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {"metadatas": []}
+        mock_vector_store.course_catalog.get.return_value = _META_EMPTY
 
         result = course_outline_tool.execute("Test")
 
@@ -74,15 +130,7 @@ class TestCourseOutlineTool:
     def test_execute_no_course_link(self, course_outline_tool, mock_vector_store):
         """Test handling when course link is not available"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": None,  # No course link
-                    "lessons_json": "[]",
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_NO_LINK
 
         result = course_outline_tool.execute("Test")
 
@@ -92,15 +140,7 @@ class TestCourseOutlineTool:
     def test_execute_no_lessons(self, course_outline_tool, mock_vector_store):
         """Test handling when course has no lessons"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": "[]",  # No lessons
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_NO_LESSONS
 
         result = course_outline_tool.execute("Test")
 
@@ -112,15 +152,7 @@ class TestCourseOutlineTool:
     ):
         """Test handling of malformed lessons JSON"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": "invalid json",  # Malformed JSON
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_MALFORMED
 
         result = course_outline_tool.execute("Test")
 
@@ -132,43 +164,71 @@ class TestCourseOutlineTool:
     ):
         """Test that lessons are sorted by lesson number"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": '[{"lesson_number": 3, "lesson_title": "Third"}, {"lesson_number": 1, "lesson_title": "First"}, {"lesson_number": 2, "lesson_title": "Second"}]',
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_UNSORTED
 
         result = course_outline_tool.execute("Test")
 
         # Check that lessons appear in the correct order
-        lines = result.split("\n")
-        lesson_lines = [
-            line
-            for line in lines
-            if line.strip() and any(char.isdigit() for char in line) and "." in line
-        ]
+        lesson_lines = [line for line in result.split("\n") if _LESSON_LINE.match(line)]
 
         assert len(lesson_lines) == 3
         assert "1. First" in lesson_lines[0]
         assert "2. Second" in lesson_lines[1]
         assert "3. Third" in lesson_lines[2]
 
+    def test_execute_lessons_json_parsed_once(
+        self, course_outline_tool, mock_vector_store
+    ):
+        """Test that identical lessons JSON is parsed only once across calls"""
+        mock_vector_store.course_catalog.get.return_value = _META_MEMO
+        _parse_lessons.cache_clear()
+
+        with patch("search_tools.orjson.loads", wraps=orjson.loads) as mock_loads:
+            first = course_outline_tool.execute("Memo")
+            # Drop the rendered outline so the second call reaches the parser
+            mock_vector_store.outline_cache.clear()
+            second = course_outline_tool.execute("Memo")
+
+        assert first == second
+        assert "1. Memo" in first
+        assert mock_vector_store.course_catalog.get.call_count == 2
+        mock_loads.assert_called_once()
+
+    def test_execute_returns_precomputed_outline(
+        self, course_outline_tool, mock_vector_store
+    ):
+        """Test that an outline rendered at ingestion skips lesson parsing"""
+        mock_vector_store.course_catalog.get.return_value = _META_PRECOMPUTED
+
+        with patch("search_tools._parse_lessons") as mock_parse:
+            result = course_outline_tool.execute("Stored")
+
+        assert result == "**Stored Course**\nCourse Link: Not available"
+        mock_parse.assert_not_called()
+
+    def test_execute_caches_outline_by_resolved_title(
+        self, course_outline_tool, mock_vector_store
+    ):
+        """Test that a repeat request is served without touching the catalog"""
+        first = course_outline_tool.execute("Test")
+        second = course_outline_tool.execute("test course")
+
+        assert first == second
+        assert mock_vector_store.outline_cache.keys() == ["Test Course"]
+        assert mock_vector_store.outline_cache.get("Test Course") == first
+        mock_vector_store.course_catalog.get.assert_called_once()
+
+    def test_execute_errors_not_cached(self, course_outline_tool, mock_vector_store):
+        """Test that a failed lookup is retried on the next request"""
+        mock_vector_store.course_catalog.get.side_effect = Exception("DB down")
+
+        assert "Error retrieving course outline" in course_outline_tool.execute("Test")
+        assert len(mock_vector_store.outline_cache) == 0
+
     def test_execute_missing_lesson_data(self, course_outline_tool, mock_vector_store):
         """Test handling of lessons with missing data"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Test Course",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": '[{"lesson_number": 1}, {"lesson_title": "No Number"}, {"lesson_number": 2, "lesson_title": "Complete"}]',
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_MISSING_DATA
 
         result = course_outline_tool.execute("Test")
 
@@ -177,6 +237,27 @@ class TestCourseOutlineTool:
         assert "Unknown. No Number" in result  # Missing number
         assert "2. Complete" in result  # Complete lesson
 
+    def test_execute_unnumbered_lessons_sorted_last(
+        self, course_outline_tool, mock_vector_store
+    ):
+        """Test that a lesson without a number follows all numbered lessons"""
+        mock_vector_store.course_catalog.get.return_value = _META_MISSING_DATA
+
+        result = course_outline_tool.execute("Test")
+
+        lesson_lines = result.split("**Lessons:**\n")[1].split("\n")
+        assert lesson_lines == ["1. Untitled", "2. Complete", "Unknown. No Number"]
+
+    def test_parse_lessons_returns_sorted_pairs(self):
+        """Test that parsed lessons are (number, title) pairs in lesson order"""
+        lessons_json = _META_MISSING_DATA["metadatas"][0]["lessons_json"]
+
+        assert _parse_lessons(lessons_json) == (
+            (1, "Untitled"),
+            (2, "Complete"),
+            ("Unknown", "No Number"),
+        )
+
     def test_execute_database_error(self, course_outline_tool, mock_vector_store):
         """Test handling of database errors"""
         mock_vector_store._resolve_course_name.return_value = "Test Course"
@@ -191,15 +272,7 @@ class TestCourseOutlineTool:
     ):
         """Test that partial course name matching works"""
         mock_vector_store._resolve_course_name.return_value = "Full Course Name"
-        mock_vector_store.course_catalog.get.return_value = {
-            "metadatas": [
-                {
-                    "title": "Full Course Name",
-                    "course_link": "http://example.com/course",
-                    "lessons_json": '[{"lesson_number": 1, "lesson_title": "Lesson 1"}]',
-                }
-            ]
-        }
+        mock_vector_store.course_catalog.get.return_value = _META_PARTIAL
 
         result = course_outline_tool.execute("Course")  # Partial name
 
@@ -254,7 +327,8 @@ class TestCourseOutlineToolEdgeCases:
 class TestCourseOutlineToolIntegration:
     """Integration tests with real vector store (if available)"""
 
-    @pytest.mark.integration
+    pytestmark = pytest.mark.integration
+
     def test_execute_with_real_vector_store(self, real_vector_store):
         """Test with real vector store to check actual outline functionality"""
         if real_vector_store is None:
@@ -1,8 +1,11 @@
 from unittest.mock import Mock, patch
 
 import pytest
-from search_tools import CourseSearchTool
-from vector_store import SearchResults
+from search_tools import CourseOutlineTool, CourseSearchTool, ToolManager
+
+# Edge-case inputs, built once for the module
+_LONG_QUERY = "test " * 1000
+_SPECIAL_QUERY = "test @#$%^&*()_+-=[]{}|;:,.<>?"
 
 
 class TestCourseSearchTool:
@@ -19,175 +22,165 @@ class TestCourseSearchTool:
         assert "query" in definition["input_schema"]["properties"]
         assert "query" in definition["input_schema"]["required"]
 
-    def test_execute_basic_query(self, course_search_tool, mock_vector_store):
-        """Test basic query execution"""
-        # Setup mock response
-        mock_vector_store.search.return_value = Mock(
-            documents=["Test content about Python"],
-            metadata=[{"course_title": "Python Course", "lesson_number": 1}],
-            distances=[0.1],
-            error=None,
-            is_empty=Mock(return_value=False),
-        )
-        mock_vector_store.get_lesson_link.return_value = "http://example.com/lesson/1"
-
-        result = course_search_tool.execute("Python basics")
-
-        # Verify the call
-        mock_vector_store.search.assert_called_once_with(
-            query="Python basics", course_name=None, lesson_number=None
-        )
-
-        # Verify result format
-        assert isinstance(result, str)
-        assert "[Python Course - Lesson 1]" in result
-        assert "Test content about Python" in result
-
-    def test_execute_with_course_filter(self, course_search_tool, mock_vector_store):
-        """Test query execution with course name filter"""
-        mock_vector_store.search.return_value = Mock(
-            documents=["Course specific content"],
-            metadata=[{"course_title": "Advanced Python", "lesson_number": 2}],
-            distances=[0.1],
-            error=None,
-            is_empty=Mock(return_value=False),
-        )
-
-        result = course_search_tool.execute("advanced topics", course_name="Python")
-
-        # Verify the call includes course filter
-        mock_vector_store.search.assert_called_once_with(
-            query="advanced topics", course_name="Python", lesson_number=None
-        )
-
-        assert "[Advanced Python - Lesson 2]" in result
-
-    def test_execute_with_lesson_filter(self, course_search_tool, mock_vector_store):
-        """Test query execution with lesson number filter"""
-        mock_vector_store.search.return_value = Mock(
-            documents=["Lesson specific content"],
-            metadata=[{"course_title": "Test Course", "lesson_number": 3}],
-            distances=[0.1],
-            error=None,
-            is_empty=Mock(return_value=False),
-        )
-
-        result = course_search_tool.execute("lesson content", lesson_number=3)
-
-        # Verify the call includes lesson filter
-        mock_vector_store.search.assert_called_once_with(
-            query="lesson content", course_name=None, lesson_number=3
-        )
-
-        assert "[Test Course - Lesson 3]" in result
+    @pytest.mark.parametrize(
+        "kwargs,results,expected",
+        [
+            pytest.param(
+                {"query": "Python basics"},
+                {
+                    "documents": ["Test content about Python"],
+                    "metadata": [{"course_title": "Python Course", "lesson_number": 1}],
+                    "distances": [0.1],
+                },
+                ["[Python Course - Lesson 1]", "Test content about Python"],
+                id="basic",
+            ),
+            pytest.param(
+                {"query": "advanced topics", "course_name": "Python"},
+                {
+                    "documents": ["Course specific content"],
+                    "metadata": [
+                        {"course_title": "Advanced Python", "lesson_number": 2}
+                    ],
+                    "distances": [0.1],
+                },
+                ["[Advanced Python - Lesson 2]"],
+                id="course-filter",
+            ),
+            pytest.param(
+                {"query": "lesson content", "lesson_number": 3},
+                {
+                    "documents": ["Lesson specific content"],
+                    "metadata": [{"course_title": "Test Course", "lesson_number": 3}],
+                    "distances": [0.1],
+                },
+                ["[Test Course - Lesson 3]"],
+                id="lesson-filter",
+            ),
+            pytest.param(
+                {
+                    "query": "specific content",
+                    "course_name": "Python",
+                    "lesson_number": 1,
+                },
+                None,
+                ["[Test Course - Lesson 1]"],
+                id="both-filters",
+            ),
+            pytest.param(
+                {"query": "nonexistent content"},
+                {},
+                ["No relevant content found"],
+                id="empty",
+            ),
+            pytest.param(
+                {"query": "test", "course_name": "Python", "lesson_number": 5},
+                {},
+                ["No relevant content found in course 'Python' in lesson 5"],
+                id="empty-with-filters",
+            ),
+        ],
+    )
+    def test_execute(
+        self,
+        course_search_tool,
+        mock_vector_store,
+        make_search_result,
+        kwargs,
+        results,
+        expected,
+    ):
+        """Test that filters reach the store and results are formatted"""
+        # None keeps the mock store's default results
+        if results is not None:
+            mock_vector_store.search.return_value = make_search_result(**results)
 
-    def test_execute_with_both_filters(self, course_search_tool, mock_vector_store):
-        """Test query execution with both course and lesson filters"""
-        result = course_search_tool.execute(
-            "specific content", course_name="Python", lesson_number=1
-        )
+        result = course_search_tool.execute(**kwargs)
 
         mock_vector_store.search.assert_called_once_with(
-            query="specific content", course_name="Python", lesson_number=1
+            **{"course_name": None, "lesson_number": None, **kwargs}
         )
+        for text in expected:
+            assert text in result
 
-    def test_execute_with_search_error(self, course_search_tool, mock_vector_store):
+    def test_execute_with_search_error(
+        self, course_search_tool, mock_vector_store, make_search_result
+    ):
         """Test handling of search errors"""
-        mock_vector_store.search.return_value = Mock(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error="Search failed: Connection error",
-            is_empty=Mock(return_value=True),
+        mock_vector_store.search.return_value = make_search_result(
+            error="Search failed: Connection error"
         )
 
         result = course_search_tool.execute("test query")
 
         assert result == "Search failed: Connection error"
 
-    def test_execute_with_empty_results(self, course_search_tool, mock_vector_store):
-        """Test handling of empty search results"""
-        mock_vector_store.search.return_value = Mock(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error=None,
-            is_empty=Mock(return_value=True),
-        )
-
-        result = course_search_tool.execute("nonexistent content")
-
-        assert "No relevant content found" in result
-
-    def test_execute_with_empty_results_and_filters(
-        self, course_search_tool, mock_vector_store
-    ):
-        """Test empty results message includes filter information"""
-        mock_vector_store.search.return_value = Mock(
-            documents=[],
-            metadata=[],
-            distances=[],
-            error=None,
-            is_empty=Mock(return_value=True),
-        )
-
-        result = course_search_tool.execute(
-            "test", course_name="Python", lesson_number=5
-        )
-
-        assert "No relevant content found in course 'Python' in lesson 5" in result
-
     def test_format_results_with_sources_tracking(
-        self, course_search_tool, mock_vector_store
+        self, course_search_tool, mock_vector_store, make_search_result
     ):
         """Test that sources and source links are properly tracked"""
-        mock_vector_store.search.return_value = Mock(
+        mock_vector_store.search.return_value = make_search_result(
             documents=["Content 1", "Content 2"],
             metadata=[
                 {"course_title": "Course A", "lesson_number": 1},
                 {"course_title": "Course B", "lesson_number": 2},
             ],
             distances=[0.1, 0.2],
-            error=None,
-            is_empty=Mock(return_value=False),
         )
-        mock_vector_store.get_lesson_link.side_effect = ["http://link1", "http://link2"]
+        mock_vector_store.get_links_batch.side_effect = None
+        mock_vector_store.get_links_batch.return_value = [
+            "http://link1",
+            "http://link2",
+        ]
 
-        result = course_search_tool.execute("test query")
+        output = course_search_tool.run("test query")
 
-        # Check that sources were tracked
-        assert len(course_search_tool.last_sources) == 2
-        assert "Course A - Lesson 1" in course_search_tool.last_sources
-        assert "Course B - Lesson 2" in course_search_tool.last_sources
+        # Links for all results are fetched in one batch
+        mock_vector_store.get_links_batch.assert_called_once_with(
+            [("Course A", 1), ("Course B", 2)]
+        )
 
-        # Check that source links were tracked
-        assert len(course_search_tool.last_source_links) == 2
-        assert "http://link1" in course_search_tool.last_source_links
-        assert "http://link2" in course_search_tool.last_source_links
+        # Sources and links are returned with the call's output
+        assert output.sources == ["Course A - Lesson 1", "Course B - Lesson 2"]
+        assert output.source_links == ["http://link1", "http://link2"]
+        assert (
+            output.content
+            == course_search_tool._format_results(
+                mock_vector_store.search.return_value
+            ).content
+        )
 
     def test_format_results_without_lesson_numbers(
-        self, course_search_tool, mock_vector_store
+        self, course_search_tool, mock_vector_store, make_search_result
     ):
         """Test formatting when lesson numbers are not available"""
-        mock_vector_store.search.return_value = Mock(
+        mock_vector_store.search.return_value = make_search_result(
             documents=["General course content"],
             metadata=[{"course_title": "General Course", "lesson_number": None}],
             distances=[0.1],
-            error=None,
-            is_empty=Mock(return_value=False),
         )
-        mock_vector_store.get_course_link.return_value = "http://course-link"
+        mock_vector_store.get_links_batch.side_effect = None
+        mock_vector_store.get_links_batch.return_value = ["http://course-link"]
 
-        result = course_search_tool.execute("general content")
+        output = course_search_tool.run("general content")
+        result = output.content
 
         assert "[General Course]" in result
         assert "Lesson" not in result.split("[General Course]")[1].split("]")[0]
 
+        # A result without a lesson cites the course-level link
+        mock_vector_store.get_links_batch.assert_called_once_with(
+            [("General Course", None)]
+        )
+        assert output.sources == ["General Course"]
+        assert output.source_links == ["http://course-link"]
+
 
 class TestCourseSearchToolWithRealVectorStore:
     """Integration tests with real vector store (if available)"""
 
-    @pytest.mark.integration
+    pytestmark = pytest.mark.integration
+
     def test_execute_with_real_vector_store(self, real_vector_store):
         """Test with real vector store to check actual search functionality"""
         if real_vector_store is None:
@@ -213,24 +206,24 @@ class TestCourseSearchToolEdgeCases:
         with pytest.raises(TypeError):
             course_search_tool.execute(None)
 
-    def test_execute_with_empty_query(self, course_search_tool, mock_vector_store):
+    def test_execute_with_empty_query(
+        self, course_search_tool, mock_vector_store, make_search_result
+    ):
         """Test handling of empty query string"""
-        mock_vector_store.search.return_value = Mock(
-            error=None, is_empty=Mock(return_value=True)
-        )
+        mock_vector_store.search.return_value = make_search_result()
 
         result = course_search_tool.execute("")
 
         # Should still call search but might return no results
         mock_vector_store.search.assert_called_once()
 
-    def test_execute_with_very_long_query(self, course_search_tool, mock_vector_store):
+    def test_execute_with_very_long_query(
+        self, course_search_tool, mock_vector_store, make_search_result
+    ):
         """Test handling of very long queries"""
-        long_query = "test " * 1000  # Very long query
+        long_query = _LONG_QUERY
 
-        mock_vector_store.search.return_value = Mock(
-            error=None, is_empty=Mock(return_value=True)
-        )
+        mock_vector_store.search.return_value = make_search_result()
 
         result = course_search_tool.execute(long_query)
 
@@ -240,16 +233,119 @@ class TestCourseSearchToolEdgeCases:
         )
 
     def test_execute_with_special_characters(
-        self, course_search_tool, mock_vector_store
+        self, course_search_tool, mock_vector_store, make_search_result
     ):
         """Test handling of queries with special characters"""
-        special_query = "test @#$%^&*()_+-=[]{}|;:,.<>?"
+        special_query = _SPECIAL_QUERY
 
-        mock_vector_store.search.return_value = Mock(
-            error=None, is_empty=Mock(return_value=True)
-        )
+        mock_vector_store.search.return_value = make_search_result()
 
         result = course_search_tool.execute(special_query)
 
         # Should handle special characters without crashing
         mock_vector_store.search.assert_called_once()
+
+
+class TestToolManager:
+    """Test suite for ToolManager functionality"""
+
+    def test_get_tool_definitions_cache_breakpoint_on_last_tool(self, tool_manager):
+        """Test that only the last tool definition carries a cache breakpoint"""
+        definitions = tool_manager.get_tool_definitions()
+
+        assert [d["name"] for d in definitions] == [
+            "search_course_content",
+            "get_course_outline",
+        ]
+        assert "cache_control" not in definitions[0]
+        assert definitions[-1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_get_tool_definitions_empty(self):
+        """Test that an empty manager returns no definitions"""
+        assert ToolManager().get_tool_definitions() == []
+
+    def test_get_tool_definitions_memoized(self, tool_manager):
+        """Test that definitions are built once at registration, not per call"""
+        first = tool_manager.get_tool_definitions()
+
+        with patch.object(CourseSearchTool, "get_tool_definition") as mock_def:
+            second = tool_manager.get_tool_definitions()
+            mock_def.assert_not_called()
+
+        assert second is first
+
+    def test_register_tool_rebuilds_definitions(self, tool_manager):
+        """Test that registering a tool refreshes the cached definitions"""
+        extra_tool = Mock()
+        extra_tool.get_tool_definition.return_value = {"name": "extra_tool"}
+
+        tool_manager.register_tool(extra_tool)
+        definitions = tool_manager.get_tool_definitions()
+
+        assert [d["name"] for d in definitions][-1] == "extra_tool"
+        assert "cache_control" not in definitions[1]
+        assert definitions[-1]["cache_control"] == {"type": "ephemeral"}
+
+    def test_register_tools_rebuilds_definitions_once(self, mock_vector_store):
+        """Test that batch registration refreshes the cached definitions once"""
+        manager = ToolManager()
+
+        with patch.object(
+            ToolManager,
+            "_rebuild_definitions_cache",
+            autospec=True,
+            side_effect=ToolManager._rebuild_definitions_cache,
+        ) as mock_rebuild:
+            manager.register_tools(
+                [
+                    CourseSearchTool(mock_vector_store),
+                    CourseOutlineTool(mock_vector_store),
+                ]
+            )
+
+        mock_rebuild.assert_called_once()
+        assert [d["name"] for d in manager.get_tool_definitions()] == [
+            "search_course_content",
+            "get_course_outline",
+        ]
+
+    def test_run_tool_returns_sources(self, tool_manager):
+        """Test that sources come back with each call, not from shared state"""
+        output = tool_manager.run_tool("search_course_content", query="Python")
+
+        assert "Test document content" in output.content
+        assert output.sources == ["Test Course - Lesson 1", "Test Course - Lesson 2"]
+
+    def test_run_tool_without_sources(self, tool_manager):
+        """Test that tools that cite nothing return empty sources"""
+        output = tool_manager.run_tool("get_course_outline", course_title="Test")
+
+        assert output.sources == []
+        assert output.source_links == []
+
+    async def test_arun_tool_runs_tool(self, tool_manager, mock_vector_store):
+        """Test that async execution delegates to the tool's run"""
+        output = await tool_manager.arun_tool("search_course_content", query="Python")
+
+        assert "Test document content" in output.content
+        mock_vector_store.search.assert_called_once_with(
+            query="Python", course_name=None, lesson_number=None
+        )
+
+    async def test_arun_tool_unknown(self, tool_manager):
+        """Test that an unknown tool name returns an error output"""
+        output = await tool_manager.arun_tool("missing")
+
+        assert output.content == "Tool 'missing' not found"
+        assert output.sources == []
+
+
+class TestSlots:
+    """Test that hot-path classes are slotted"""
+
+    def test_tools_and_manager_have_no_instance_dict(
+        self, course_search_tool, course_outline_tool, tool_manager
+    ):
+        """Test that slotted instances carry no per-instance __dict__"""
+        for instance in (course_search_tool, course_outline_tool, tool_manager):
+            assert not hasattr(instance, "__dict__")
@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from response_cache import ResponseCache
+
+
+def fake_embedding_function(texts):
+    """Deterministic bag-of-characters embedding for tests"""
+    embeddings = []
+    for text in texts:
+        vector = [0.0] * 16
+        for char in text.lower():
+            vector[ord(char) % 16] += 1.0
+        embeddings.append(vector)
+    return embeddings
+
+
+@pytest.fixture
+def response_cache():
+    """ResponseCache backed by the fake embedding function"""
+    return ResponseCache(fake_embedding_function, ttl_seconds=60, max_entries=3)
+
+
+class TestResponseCache:
+    """Test suite for the semantic response cache"""
+
+    def test_lookup_empty_cache(self, response_cache):
+        """Test that an empty cache misses but still returns the embedding"""
+        cached, embedding = response_cache.lookup("What is MCP?")
+
+        assert cached is None
+        assert embedding == fake_embedding_function(["What is MCP?"])[0]
+
+    def test_store_and_hit(self, response_cache):
+        """Test that an identical query in the same context hits"""
+        tools = [{"name": "search_course_content"}]
+        _, embedding = response_cache.lookup("What is MCP?", "User: Hi", tools)
+        response_cache.store(
+            "What is MCP?", embedding, "MCP is a protocol", "User: Hi", tools
+        )
+
+        cached, _ = response_cache.lookup("What is MCP?", "User: Hi", tools)
+
+        assert cached.response == "MCP is a protocol"
+        assert cached.sources == []
+
+    def test_hit_returns_sources(self, response_cache):
+        """Test that a hit returns the sources stored with the answer"""
+        response_cache.store(
+            "What is MCP?",
+            response_cache.embed("What is MCP?"),
+            "MCP is a protocol",
+            sources=["MCP Course - Lesson 1", "MCP Course"],
+            source_links=["http://lesson1", None],
+        )
+
+        cached, _ = response_cache.lookup("What is MCP?")
+
+        assert cached.sources == ["MCP Course - Lesson 1", "MCP Course"]
+        assert cached.source_links == ["http://lesson1", None]
+
+    def test_different_lesson_numbers_miss(self, response_cache):
+        """Test that near-identical questions about different lessons never collide"""
+        question = "What is covered in lesson 1 of the MCP course?"
+        response_cache.store(question, response_cache.embed(question), "Lesson 1")
+
+        other = "What is covered in lesson 2 of the MCP course?"
+        cached, _ = response_cache.lookup(other)
+
+        assert cached is None
+        assert response_cache.lookup(question)[0].response == "Lesson 1"
+
+    def test_dissimilar_query_misses(self, response_cache):
+        """Test that a semantically distant query misses"""
+        _, embedding = response_cache.lookup("What is MCP?")
+        response_cache.store("What is MCP?", embedding, "MCP is a protocol")
+
+        cached, _ = response_cache.lookup("zzzz xxxx qqqq")
+
+        assert cached is None
+
+    def test_different_history_misses(self, response_cache):
+        """Test that conversation history is part of the cache key"""
+        _, embedding = response_cache.lookup("What is MCP?", "User: Hi")
+        response_cache.store("What is MCP?", embedding, "MCP is a protocol", "User: Hi")
+
+        cached, _ = response_cache.lookup("What is MCP?", "User: Something else")
+
+        assert cached is None
+
+    def test_different_tools_miss(self, response_cache):
+        """Test that the tool set is part of the cache key"""
+        tools = [{"name": "search_course_content"}]
+        _, embedding = response_cache.lookup("What is MCP?", tools=tools)
+        response_cache.store(
+            "What is MCP?", embedding, "MCP is a protocol", tools=tools
+        )
+
+        cached, _ = response_cache.lookup("What is MCP?")
+
+        assert cached is None
+
+    def test_ttl_expiry(self, response_cache):
+        """Test that expired entries are evicted on lookup"""
+        _, embedding = response_cache.lookup("What is MCP?")
+        response_cache.store("What is MCP?", embedding, "MCP is a protocol")
+
+        response_cache.ttl_seconds = 0
+        time.sleep(0.01)
+        cached, _ = response_cache.lookup("What is MCP?")
+
+        assert cached is None
+        assert response_cache.collection.count() == 0
+
+    def test_max_entries_evicts_oldest(self, response_cache):
+        """Test that the oldest entry is evicted once the cap is reached"""
+        for query in ["first query", "second query", "third query", "fourth query"]:
+            response_cache.store(
+                query, response_cache.embed(query), f"Answer to {query}"
+            )
+
+        assert response_cache.collection.count() == 3
+        assert response_cache.lookup("first query")[0] is None
+        assert response_cache.lookup("fourth query")[0].response == (
+            "Answer to fourth query"
+        )
+
+    def test_clear(self, response_cache):
+        """Test that clear removes every entry"""
+        response_cache.store(
+            "What is MCP?", response_cache.embed("What is MCP?"), "MCP"
+        )
+
+        response_cache.clear()
+
+        assert response_cache.collection.count() == 0
+        assert response_cache.lookup("What is MCP?")[0] is None
+
+    def test_concurrent_stores_stay_bounded(self, response_cache):
+        """Test that stores from many threads keep the index and collection in step"""
+        queries = [f"query number {i}" for i in range(20)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(
+                executor.map(
+                    lambda query: response_cache.store(
+                        query, response_cache.embed(query), f"Answer to {query}"
+                    ),
+                    queries,
+                )
+            )
+
+        assert len(response_cache._entries) == 3
+        assert response_cache.collection.count() == 3
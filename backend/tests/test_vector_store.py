@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+import pytest
+from models import Course, Lesson
+from vector_store import BoundedCache, VectorStore
+
+
+@pytest.fixture
+def vector_store():
+    """VectorStore whose Chroma client and collections are mocked"""
+    with patch("vector_store.chromadb"):
+        store = VectorStore("./unused_chroma_path", "all-MiniLM-L6-v2")
+    store.course_catalog = Mock()
+    store.course_catalog.query.return_value = {
+        "documents": [["Test Course"]],
+        "metadatas": [[{"title": "Test Course"}]],
+    }
+    return store
+
+
+class TestClientSelection:
+    """Test choice between persistent and in-memory Chroma clients"""
+
+    def test_path_uses_persistent_client(self):
+        """Test that a Chroma path keeps data on disk"""
+        with patch("vector_store.chromadb") as mock_chromadb:
+            VectorStore("./unused_chroma_path", "all-MiniLM-L6-v2")
+
+        mock_chromadb.PersistentClient.assert_called_once()
+        mock_chromadb.EphemeralClient.assert_not_called()
+
+    def test_no_path_uses_ephemeral_client(self):
+        """Test that omitting the path keeps data in memory"""
+        with patch("vector_store.chromadb") as mock_chromadb:
+            VectorStore(None, "all-MiniLM-L6-v2")
+
+        mock_chromadb.EphemeralClient.assert_called_once()
+        mock_chromadb.PersistentClient.assert_not_called()
+
+
+class TestEmbeddingFunction:
+    """Test reuse of an already loaded embedding function"""
+
+    def test_supplied_embedding_function_reused(self):
+        """Test that a supplied embedding function skips loading the model"""
+        embedding_function = Mock()
+        with patch("vector_store.chromadb") as mock_chromadb:
+            store = VectorStore(
+                None, "all-MiniLM-L6-v2", embedding_function=embedding_function
+            )
+
+        assert store.embedding_function is embedding_function
+        embedding_functions = mock_chromadb.utils.embedding_functions
+        embedding_functions.SentenceTransformerEmbeddingFunction.assert_not_called()
+
+
+class TestResolveCourseNameCache:
+    """Test caching of course name resolution"""
+
+    def test_repeated_resolution_hits_cache(self, vector_store):
+        """Test that a repeated course name skips the catalog query"""
+        assert vector_store._resolve_course_name("Test") == "Test Course"
+        assert vector_store._resolve_course_name("Test") == "Test Course"
+
+        vector_store.course_catalog.query.assert_called_once()
+
+    def test_unresolved_names_not_cached(self, vector_store):
+        """Test that failed resolutions are retried"""
+        vector_store.course_catalog.query.return_value = {
+            "documents": [[]],
+            "metadatas": [[]],
+        }
+
+        assert vector_store._resolve_course_name("Missing") is None
+        assert vector_store._resolve_course_name("Missing") is None
+
+        assert vector_store.course_catalog.query.call_count == 2
+
+    def test_add_course_metadata_invalidates_cache(self, vector_store):
+        """Test that ingesting a course clears cached resolutions"""
+        vector_store._resolve_course_name("Test")
+
+        vector_store.add_course_metadata(Course(title="New Course"))
+        vector_store._resolve_course_name("Test")
+
+        assert vector_store.course_catalog.query.call_count == 2
+
+    def test_add_course_metadata_invalidates_outlines(self, vector_store):
+        """Test that ingesting a course drops cached outlines"""
+        vector_store.outline_cache.put("Old Course", "**Old Course**")
+
+        vector_store.add_course_metadata(Course(title="New Course"))
+
+        assert len(vector_store.outline_cache) == 0
+
+    def test_cache_size_bounded(self, vector_store):
+        """Test that the oldest resolution is evicted once the cache is full"""
+        vector_store._resolve_cache.maxsize = 2
+
+        for name in ["first", "second", "third"]:
+            vector_store._resolve_course_name(name)
+
+        assert vector_store._resolve_cache.keys() == ["second", "third"]
+
+    def test_cache_concurrent_puts_stay_bounded(self):
+        """Test that concurrent inserts never over-evict or exceed the bound"""
+        cache = BoundedCache(8)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: cache.put(f"course {i}", i), range(200)))
+
+        assert len(cache) == 8
+
+
+class TestGetLinksBatch:
+    """Test batched link lookups"""
+
+    def test_links_resolved_in_one_fetch(self, vector_store):
+        """Test lesson and course links come from a single catalog get"""
+        vector_store.course_catalog.get.return_value = {
+            "ids": ["Course A", "Course B"],
+            "metadatas": [
+                {
+                    "course_link": "http://a",
+                    "lessons_json": '[{"lesson_number": 1, "lesson_link": "http://a/1"}]',
+                },
+                {"course_link": "http://b", "lessons_json": "[]"},
+            ],
+        }
+
+        links = vector_store.get_links_batch(
+            [("Course A", 1), ("Course A", 1), ("Course B", None), ("unknown", None)]
+        )
+
+        assert links == ["http://a/1", "http://a/1", "http://b", None]
+        vector_store.course_catalog.get.assert_called_once_with(
+            ids=["Course A", "Course B", "unknown"]
+        )
+
+    def test_corrupt_lessons_json_isolated_to_course(self, vector_store):
+        """Test that one course's bad lessons JSON only drops its lesson links"""
+        vector_store.course_catalog.get.return_value = {
+            "ids": ["Course A", "Course B"],
+            "metadatas": [
+                {"course_link": "http://a", "lessons_json": "{not json"},
+                {
+                    "course_link": "http://b",
+                    "lessons_json": '[{"lesson_number": 1, "lesson_link": "http://b/1"}]',
+                },
+            ],
+        }
+
+        links = vector_store.get_links_batch(
+            [("Course A", 1), ("Course A", None), ("Course B", 1)]
+        )
+
+        assert links == [None, "http://a", "http://b/1"]
+
+    def test_empty_pairs(self, vector_store):
+        """Test that no pairs means no catalog fetch"""
+        assert vector_store.get_links_batch([]) == []
+        vector_store.course_catalog.get.assert_not_called()
+
+    def test_catalog_error_returns_none_links(self, vector_store):
+        """Test that a catalog error degrades to missing links"""
+        vector_store.course_catalog.get.side_effect = Exception("DB error")
+
+        assert vector_store.get_links_batch([("Course A", 1)]) == [None]
+
+
+class TestAddCourseMetadata:
+    """Test catalog metadata written at ingestion"""
+
+    def test_formatted_outline_stored(self, vector_store):
+        """Test that the outline is rendered once with lessons in order"""
+        course = Course(
+            title="Outline Course",
+            course_link="http://course",
+            lessons=[
+                Lesson(lesson_number=2, title="Second"),
+                Lesson(lesson_number=1, title="First"),
+            ],
+        )
+
+        vector_store.add_course_metadata(course)
+
+        metadata = vector_store.course_catalog.upsert.call_args[1]["metadatas"][0]
+        assert metadata["formatted_outline"] == (
+            "**Outline Course**\nCourse Link: http://course\n"
+            "\n**Lessons:**\n1. First\n2. Second"
+        )
+
+    def test_reingest_refreshes_outline(self, vector_store):
+        """Test that re-ingesting a course replaces its stored outline"""
+        vector_store.outline_cache.put("Outline Course", "stale outline")
+        course = Course(
+            title="Outline Course",
+            lessons=[Lesson(lesson_number=1, title="Rewritten")],
+        )
+
+        vector_store.add_course_metadata(course)
+
+        metadata = vector_store.course_catalog.upsert.call_args[1]["metadatas"][0]
+        assert metadata["formatted_outline"].endswith("1. Rewritten")
+        assert vector_store.outline_cache.get("Outline Course") is None
+        vector_store.course_catalog.add.assert_not_called()
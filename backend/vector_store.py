@@ -1,7 +1,10 @@
+import threading
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import chromadb
+import orjson
 from chromadb.config import Settings
 from models import Course, CourseChunk
 from sentence_transformers import SentenceTransformer
@@ -41,22 +44,113 @@ class SearchResults:
         return len(self.documents) == 0
 
 
+def format_course_outline(
+    title: str, course_link: Optional[str], lessons: Sequence[Tuple[Any, str]]
+) -> str:
+    """
+    Render a course outline from its title, link and (number, title) lesson
+    pairs sorted by number
+    """
+    outline_parts = [f"**{title}**"]
+
+    if course_link:
+        outline_parts.append(f"Course Link: {course_link}")
+    else:
+        outline_parts.append("Course Link: Not available")
+
+    if lessons:
+        outline_parts.append("\n**Lessons:**")
+        outline_parts.extend(f"{number}. {name}" for number, name in lessons)
+    else:
+        outline_parts.append("\nNo lessons found for this course.")
+
+    return "\n".join(outline_parts)
+
+
+class BoundedCache:
+    """
+    Thread-safe dict bounded to maxsize entries, evicting the oldest first.
+
+    Request threads share the store's caches, so every read, insert and
+    eviction happens under one lock.
+    """
+
+    __slots__ = ("maxsize", "_data", "_lock")
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for key, or None"""
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key: str, value: Any):
+        """Cache value under key, evicting the oldest entries when full"""
+        with self._lock:
+            if key not in self._data:
+                # Drop the oldest entries (dicts keep insertion order)
+                while len(self._data) >= self.maxsize:
+                    del self._data[next(iter(self._data))]
+            self._data[key] = value
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> List[str]:
+        """Snapshot of the keys, oldest first"""
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
 
-    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
+    # Maximum number of course name resolutions kept in memory
+    RESOLVE_CACHE_SIZE = 512
+    # Maximum number of rendered course outlines kept in memory
+    OUTLINE_CACHE_SIZE = 256
+
+    def __init__(
+        self,
+        chroma_path: Optional[str],
+        embedding_model: str,
+        max_results: int = 5,
+        embedding_function=None,
+    ):
         self.max_results = max_results
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=chroma_path, settings=Settings(anonymized_telemetry=False)
-        )
+        # Course name -> resolved title; invalidated whenever the catalog changes
+        self._resolve_cache = BoundedCache(self.RESOLVE_CACHE_SIZE)
+        # Resolved title -> formatted outline, filled by the outline tool;
+        # invalidated together with the resolve cache
+        self.outline_cache = BoundedCache(self.OUTLINE_CACHE_SIZE)
+        # Initialize ChromaDB client; without a path the data lives in memory only.
+        # The in-memory client is process-wide, so its collections are shared.
+        if chroma_path is None:
+            self.client = chromadb.EphemeralClient(
+                settings=Settings(anonymized_telemetry=False)
+            )
+        else:
+            self.client = chromadb.PersistentClient(
+                path=chroma_path, settings=Settings(anonymized_telemetry=False)
+            )
 
-        # Set up sentence transformer embedding function
-        self.embedding_function = (
-            chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name=embedding_model
+        # Set up sentence transformer embedding function, unless an already
+        # loaded one is supplied
+        if embedding_function is None:
+            embedding_function = (
+                chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=embedding_model
+                )
             )
-        )
+        self.embedding_function = embedding_function
 
         # Create collections for different types of data
         self.course_catalog = self._create_collection(
@@ -115,17 +209,29 @@ class VectorStore:
 
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
         """Use vector search to find best matching course by name"""
+        # Users keep asking about the same few courses; skip the embedding + query
+        cached = self._resolve_cache.get(course_name)
+        if cached is not None:
+            return cached
+
         try:
             results = self.course_catalog.query(query_texts=[course_name], n_results=1)
 
             if results["documents"][0] and results["metadatas"][0]:
                 # Return the title (which is now the ID)
-                return results["metadatas"][0][0]["title"]
+                title = results["metadatas"][0][0]["title"]
+                self._resolve_cache.put(course_name, title)
+                return title
         except Exception as e:
             print(f"Error resolving course name: {e}")
 
         return None
 
+    def clear_catalog_caches(self):
+        """Forget cached course name resolutions and outlines after the catalog changes"""
+        self._resolve_cache.clear()
+        self.outline_cache.clear()
+
     def _build_filter(
         self, course_title: Optional[str], lesson_number: Optional[int]
     ) -> Optional[Dict]:
@@ -149,7 +255,8 @@ class VectorStore:
 
     def add_course_metadata(self, course: Course):
         """Add course information to the catalog for semantic search"""
-        import json
+        # A new course can become the best match for previously resolved names
+        self.clear_catalog_caches()
 
         course_text = course.title
 
@@ -164,17 +271,31 @@ class VectorStore:
                 }
             )
 
-        self.course_catalog.add(
+        # Upsert so re-ingesting a course refreshes its stored outline
+        self.course_catalog.upsert(
             documents=[course_text],
             metadatas=[
                 {
                     "title": course.title,
                     "instructor": course.instructor,
                     "course_link": course.course_link,
-                    "lessons_json": json.dumps(
+                    "lessons_json": orjson.dumps(
                         lessons_metadata
-                    ),  # Serialize as JSON string
+                    ).decode(),  # Serialize as JSON string
                     "lesson_count": len(course.lessons),
+                    # Outlines only change on re-ingestion, so render them once
+                    "formatted_outline": format_course_outline(
+                        course.title,
+                        course.course_link,
+                        list(
+                            map(
+                                itemgetter("lesson_number", "lesson_title"),
+                                sorted(
+                                    lessons_metadata, key=itemgetter("lesson_number")
+                                ),
+                            )
+                        ),
+                    ),
                 }
             ],
             ids=[course.title],
@@ -205,6 +326,7 @@ class VectorStore:
     def clear_all_data(self):
         """Clear all data from both collections"""
         try:
+            self.clear_catalog_caches()
             self.client.delete_collection("course_catalog")
             self.client.delete_collection("course_content")
             # Recreate collections
@@ -238,8 +360,6 @@ class VectorStore:
 
     def get_all_courses_metadata(self) -> List[Dict[str, Any]]:
         """Get metadata for all courses in the vector store"""
-        import json
-
         try:
             results = self.course_catalog.get()
             if results and "metadatas" in results:
@@ -248,7 +368,9 @@ class VectorStore:
                 for metadata in results["metadatas"]:
                     course_meta = metadata.copy()
                     if "lessons_json" in course_meta:
-                        course_meta["lessons"] = json.loads(course_meta["lessons_json"])
+                        course_meta["lessons"] = orjson.loads(
+                            course_meta["lessons_json"]
+                        )
                         del course_meta[
                             "lessons_json"
                         ]  # Remove the JSON string version
@@ -274,8 +396,6 @@ class VectorStore:
 
     def get_lesson_link(self, course_title: str, lesson_number: int) -> Optional[str]:
         """Get lesson link for a given course title and lesson number"""
-        import json
-
         try:
             # Get course by ID (title is the ID)
             results = self.course_catalog.get(ids=[course_title])
@@ -283,7 +403,7 @@ class VectorStore:
                 metadata = results["metadatas"][0]
                 lessons_json = metadata.get("lessons_json")
                 if lessons_json:
-                    lessons = json.loads(lessons_json)
+                    lessons = orjson.loads(lessons_json)
                     # Find the lesson with matching number
                     for lesson in lessons:
                         if lesson.get("lesson_number") == lesson_number:
@@ -291,3 +411,49 @@ class VectorStore:
             return None
         except Exception as e:
             print(f"Error getting lesson link: {e}")
+
+    def get_links_batch(
+        self, pairs: List[Tuple[str, Optional[int]]]
+    ) -> List[Optional[str]]:
+        """
+        Get links for many (course title, lesson number) pairs in one catalog fetch.
+
+        Pairs with a lesson number resolve to the lesson link, pairs without
+        one to the course link; unknown courses or lessons yield None.
+        """
+        if not pairs:
+            return []
+
+        titles = list(dict.fromkeys(title for title, _ in pairs))
+        try:
+            results = self.course_catalog.get(ids=titles)
+        except Exception as e:
+            print(f"Error getting links: {e}")
+            return [None] * len(pairs)
+
+        # Index course and lesson links by title, parsing each course once
+        course_links: Dict[str, Optional[str]] = {}
+        lesson_links: Dict[str, Dict[int, Optional[str]]] = {}
+        for course_id, metadata in zip(
+            results.get("ids") or [], results.get("metadatas") or []
+        ):
+            course_links[course_id] = metadata.get("course_link")
+            try:
+                lessons = orjson.loads(metadata.get("lessons_json") or "[]")
+            except orjson.JSONDecodeError as e:
+                # A corrupt course loses its lesson links, not the whole batch
+                print(f"Error parsing lessons for {course_id}: {e}")
+                lessons = []
+            lesson_links[course_id] = {
+                lesson.get("lesson_number"): lesson.get("lesson_link")
+                for lesson in lessons
+            }
+
+        return [
+            (
+                lesson_links.get(title, {}).get(lesson_number)
+                if lesson_number is not None
+                else course_links.get(title)
+            )
+            for title, lesson_number in pairs
+        ]
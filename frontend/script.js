@@ -89,7 +89,7 @@ async function sendMessage() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 
     try {
-        const response = await fetch(`${API_URL}/query`, {
+        const response = await fetch(`${API_URL}/query/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -101,18 +101,50 @@ async function sendMessage() {
             signal: currentAbortController.signal  // Pass abort signal to fetch
         });
 
-        if (!response.ok) throw new Error('Query failed');
+        if (!response.ok || !response.body) throw new Error('Query failed');
 
-        const data = await response.json();
-        
-        // Update session ID if new
-        if (!currentSessionId) {
-            currentSessionId = data.session_id;
+        // Read newline-delimited JSON events as they arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let sources = null;
+        let sourceLinks = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+
+                if (event.type === 'session') {
+                    // Update session ID if new
+                    if (!currentSessionId) {
+                        currentSessionId = event.session_id;
+                    }
+                } else if (event.type === 'text') {
+                    // Render partial answer in place of the loading indicator
+                    answer += event.text;
+                    loadingMessage.querySelector('.message-content').innerHTML = marked.parse(answer);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event.type === 'sources') {
+                    sources = event.sources;
+                    sourceLinks = event.source_links;
+                } else if (event.type === 'error') {
+                    throw new Error(event.detail);
+                }
+            }
         }
 
-        // Replace loading message with response
+        // Replace streamed message with the final response and its sources
         loadingMessage.remove();
-        addMessage(data.answer, 'assistant', data.sources, data.source_links);
+        addMessage(answer, 'assistant', sources, sourceLinks);
 
     } catch (error) {
         // Remove loading message